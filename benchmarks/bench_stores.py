@@ -0,0 +1,164 @@
+"""Benchmark the store backends with a rerun workload of N runs x M tests x K metrics.
+
+    python benchmarks/bench_stores.py [--runs 1000] [--tests 20] [--metrics 5] [--stores polars,pandas]
+                                      [--formats parquet,csv,json,sqlite] [--compare benchmarks/results/<file>.json]
+
+Reports the throughput of 'set_index', 'set', 'get' and 'append', the peak memory (tracemalloc) of the
+workload and the save latency per format. The results are written to 'benchmarks/results/' as JSON
+(named by version and time), use '--compare' to show the change against an earlier result.
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+from importlib import metadata
+import json
+from pathlib import Path
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from pytest_store.stores import Stores
+from pytest_store.stores._store_base import SaveSettings, StoreBase
+
+STORES = ("polars", "pandas", "list-dict", "sqlite-stream", "long")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _names(tests: int, metrics: int) -> list[list[str]]:
+    return [[f"test_{t}.metric_{k}" for k in range(metrics)] for t in range(tests)]
+
+
+def workload(store: StoreBase, runs: int, names: list[list[str]]) -> dict[str, float]:
+    """Run the workload and return the duration per operation in seconds."""
+    durations = dict.fromkeys(("set_index", "set", "get", "append"), 0.0)
+    append_names = [f"test_{t}.samples" for t in range(len(names))]
+    for run in range(runs):
+        start = time.perf_counter()
+        store.set_index(run)
+        durations["set_index"] += time.perf_counter() - start
+        start = time.perf_counter()
+        for test in names:
+            for k, name in enumerate(test):
+                store.set(name, run * 0.5 + k)
+        durations["set"] += time.perf_counter() - start
+        start = time.perf_counter()
+        for test in names:
+            for name in test:
+                store.get(name)
+        durations["get"] += time.perf_counter() - start
+        start = time.perf_counter()
+        for name in append_names:
+            store.append(name, run)
+        durations["append"] += time.perf_counter() - start
+    return durations
+
+
+def peak_memory(factory: Callable[[], StoreBase], runs: int, names: list[list[str]]) -> int:
+    tracemalloc.start()
+    try:
+        store = factory()
+        workload(store, runs, names)
+        _data = store.data  # includes building the data frame
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def save_latency(store: StoreBase, fmt: str, directory: Path) -> float | str:
+    settings = SaveSettings(path=directory / f"bench.{fmt}", name="bench", format=fmt)
+    start = time.perf_counter()
+    try:
+        store.save(settings)
+    except Exception as e:  # unsupported format or missing writer
+        return f"{type(e).__name__}: {e}"[:80]
+    duration = time.perf_counter() - start
+    if not settings.path.exists():
+        return "not written"
+    return duration
+
+
+def bench_store(name: str, runs: int, tests: int, metrics: int, formats: list[str]) -> dict[str, Any]:
+    factory = Stores[name]
+    assert factory is not None
+    names = _names(tests, metrics)
+    store = factory()
+    durations = workload(store, runs, names)
+    counts = {"set_index": runs, "set": runs * tests * metrics, "get": runs * tests * metrics, "append": runs * tests}
+    result: dict[str, Any] = {
+        "ops_per_sec": {op: counts[op] / durations[op] if durations[op] else None for op in durations},
+        "peak_memory_mb": peak_memory(factory, runs, names) / 1e6,
+        "save_sec": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in formats:
+            result["save_sec"][fmt] = save_latency(store, fmt, Path(directory))
+    return result
+
+
+def _version() -> str:
+    try:
+        return metadata.version("pytest-store")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _print(results: dict[str, Any], previous: dict[str, Any] | None = None):
+    def change(new, old):
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or not old:
+            return ""
+        return f" ({(new / old - 1) * 100:+.0f}%)"
+
+    for name, result in results["stores"].items():
+        old = (previous or {}).get("stores", {}).get(name, {})
+        print(f"{name}:")
+        for op, value in result["ops_per_sec"].items():
+            old_value = old.get("ops_per_sec", {}).get(op)
+            print(f"  {op:<10} {value or 0:>14,.0f} ops/s{change(value, old_value)}")
+        memory = result["peak_memory_mb"]
+        print(f"  {'memory':<10} {memory:>14.1f} MB{change(memory, old.get('peak_memory_mb'))}")
+        for fmt, value in result["save_sec"].items():
+            old_value = old.get("save_sec", {}).get(fmt)
+            if isinstance(value, str):
+                print(f"  save {fmt:<5} {value}")
+            else:
+                print(f"  save {fmt:<5} {value * 1000:>14.1f} ms{change(value, old_value)}")
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--tests", type=int, default=20)
+    parser.add_argument("--metrics", type=int, default=5)
+    parser.add_argument("--stores", default=",".join(STORES))
+    parser.add_argument("--formats", default="parquet,csv,json,sqlite")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="Directory for the results.")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare with.")
+    options = parser.parse_args(args)
+
+    results: dict[str, Any] = {
+        "version": _version(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "workload": {"runs": options.runs, "tests": options.tests, "metrics": options.metrics},
+        "stores": {},
+    }
+    for name in options.stores.split(","):
+        if name not in Stores:
+            print(f"{name}: not installed, skipped")
+            continue
+        results["stores"][name] = bench_store(
+            name, options.runs, options.tests, options.metrics, options.formats.split(",")
+        )
+    previous = json.loads(options.compare.read_text()) if options.compare else None
+    _print(results, previous)
+    options.output.mkdir(parents=True, exist_ok=True)
+    path = options.output / f"{results['version']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    path.write_text(json.dumps(results, indent=2))
+    print(f"results written to '{path}'")
+
+
+if __name__ == "__main__":
+    main()
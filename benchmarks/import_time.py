@@ -0,0 +1,57 @@
+"""Measure the import time of the plugin with 'python -X importtime'.
+
+    python benchmarks/import_time.py [--repeat 5] [--module pytest_store.plugin] [--top 10]
+
+Modules already imported by pytest are not counted, the cumulative time of the plugin module
+is reported together with the slowest modules imported by it.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def import_times(module: str, baseline: str = "pytest") -> dict[str, int]:
+    """Return the cumulative import time in microseconds per module imported after 'baseline'."""
+    code = f"import {baseline}; import {module}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    times: dict[str, int] = {}
+    after_baseline = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, name = line[len("import time:") :].split("|")
+        if after_baseline:
+            times[name.strip()] = int(cumulative)
+        elif name.strip() == baseline and not name.startswith("  "):
+            after_baseline = True
+    return times
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="pytest_store.plugin")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Show the slowest modules.")
+    options = parser.parse_args(args)
+
+    totals = []
+    modules: dict[str, list[int]] = {}
+    for _ in range(options.repeat):
+        times = import_times(options.module)
+        totals.append(times[options.module])
+        for name, cumulative in times.items():
+            modules.setdefault(name, []).append(cumulative)
+    print(
+        f"{options.module}: median {statistics.median(totals) / 1000:.1f} ms, "
+        f"min {min(totals) / 1000:.1f} ms ({options.repeat} runs)"
+    )
+    slowest = sorted(modules.items(), key=lambda m: statistics.median(m[1]), reverse=True)
+    for name, values in slowest[1 : options.top + 1]:
+        print(f"  {statistics.median(values) / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
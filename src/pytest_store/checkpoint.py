@@ -0,0 +1,118 @@
+"""Incremental checkpoints, the values changed since the last checkpoint are appended to a JSON Lines file."""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import time
+from typing import Iterator, Optional, Union
+
+import msgspec
+
+from .types import STORE_TYPES
+
+
+class Checkpoint:
+    """Append-only JSON Lines sidecar file, each line holds the 'RUN' and the values changed in this run.
+
+    A checkpoint is written every `every_runs` runs and/or every `interval` seconds.
+    """
+
+    def __init__(self, path: Union[str, Path], every_runs: int = 0, interval: float = 0):
+        self.path = Path(path)
+        self._every_runs = every_runs if every_runs or interval else 1
+        self._interval = interval
+        self._changed: dict[int, dict[str, STORE_TYPES]] = {}
+        self._runs = 0
+        self._next_time = time.monotonic() + interval
+        self._encoder = msgspec.json.Encoder()
+        self._checked = False  # partial last line removed
+
+    def record(self, run: int, name: str, value: STORE_TYPES):
+        self._changed.setdefault(run, {})[name] = value
+        if self._interval and time.monotonic() >= self._next_time:
+            self.write()
+
+    def next_run(self):
+        """Called when the run changes."""
+        self._runs += 1
+        if self._every_runs and self._runs >= self._every_runs:
+            self.write()
+
+    def write(self):
+        """Append the changed values to the file."""
+        self._runs = 0
+        self._next_time = time.monotonic() + self._interval
+        if not self._changed:
+            return
+        lines = [self._encoder.encode({"RUN": run, **values}) for run, values in self._changed.items()]
+        if not self._checked:
+            self._remove_partial_line()
+            self._checked = True
+        with open(self.path, "ab") as file:
+            file.write(b"\n".join(lines) + b"\n")
+        self._changed = {}
+
+    def _remove_partial_line(self, chunk_size: int = 4096):
+        """Truncate the file after its last newline, the last line is incomplete after a crash."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r+b") as file:
+            end = file.seek(0, 2)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - chunk_size)
+                file.seek(start)
+                newline = file.read(pos - start).rfind(b"\n")
+                if newline >= 0:
+                    pos = start + newline + 1
+                    break
+                pos = start
+            if pos < end:
+                file.truncate(pos)
+
+    def clear(self):
+        """Start with an empty file."""
+        self._changed = {}
+        self.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def read(path: Union[str, Path]) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        """Read all checkpoints as '(run, values)', later values overwrite earlier ones."""
+        rows: dict[int, dict[str, STORE_TYPES]] = {}
+        decoder = msgspec.json.Decoder()
+        path = Path(path)
+        if path.exists():
+            with open(path, "rb") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        values = decoder.decode(line)
+                    except msgspec.DecodeError:
+                        continue  # incomplete line, e.g. after a crash
+                    if not isinstance(values, dict) or "RUN" not in values:
+                        continue
+                    rows.setdefault(values.pop("RUN"), {}).update(values)
+        yield from rows.items()
+
+
+def main(args: Optional[list[str]] = None):
+    """Compact a checkpoint file into a save file, e.g. 'python -m pytest_store.checkpoint ckpt.jsonl out.parquet'."""
+    from .store import Store
+    from .stores import Stores
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("checkpoint", help="Checkpoint file (JSON Lines).")
+    parser.add_argument("save", help="Save file, format depends on the ending unless specified.")
+    parser.add_argument("--format", help="Save format.")
+    parser.add_argument("--store-type", default="default", choices=[n for n in Stores if n != "none"])
+    parser.add_argument("--force", action="store_true", help="Overwrite existing file")
+    options = parser.parse_args(args)
+    store = Store(Stores[options.store_type]())  # type: ignore[misc]
+    if store.store is not None:
+        store.store.merge_rows(Checkpoint.read(options.checkpoint))
+    store.save(options.save, format=options.format, force=options.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Hive partitioned parquet dataset, part files are written while the tests run."""
+from __future__ import annotations
+
+from datetime import datetime
+import os
+from pathlib import Path
+from typing import Any, Optional, Sequence, Union
+
+from .types import STORE_TYPES
+from .stores._append import conform_table
+
+DATASET_FORMATS = ("dataset", "parquet-dataset")
+PARTITION_KEYS = ("session", "run", "test")
+# partition value for names without test prefix, e.g. 'PASS'
+NO_TEST = "_session"
+
+
+def parse_partition_by(value: Union[str, Sequence[str]]) -> tuple[str, ...]:
+    names = value.replace(" ", "").split(",") if isinstance(value, str) else list(value)
+    names = [n for n in names if n]
+    for name in names:
+        if name not in PARTITION_KEYS:
+            raise UserWarning(f"Partition '{name}' does not exist, use {', '.join(PARTITION_KEYS)}.")
+    return tuple(names)
+
+
+class DatasetWriter:
+    """Write the values as parquet files below 'path', partitioned by 'partition_by' (hive style, 'key=value').
+
+    - session: one partition per session (start time)
+    - run: one partition per 'runs_per_part' runs, named by the first run
+    - test: one partition per test, the columns are stored without the test prefix
+
+    A part file is written every 'runs_per_part' runs. Values set after the part of their run was
+    written (e.g. 'PASS' at the end of the session) are kept until 'close()' and merged into the rows
+    of their runs, each run has one row per partition. 'close()' writes the remaining values, gives all
+    parts of the session the same schema (missing columns are null) and writes the '_common_metadata'
+    and '_metadata' files. Other 'options' are passed to 'pyarrow.parquet.write_table', e.g. 'compression'.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        partition_by: Union[str, Sequence[str]] = ("session",),
+        runs_per_part: int = 1000,
+        session: Optional[str] = None,
+        **options: Any,
+    ):
+        self.path = Path(path)
+        self.partition_by = parse_partition_by(partition_by)
+        self.runs_per_part = max(1, int(runs_per_part))
+        self.session = session or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.options = options
+        self._changed: dict[int, dict[str, STORE_TYPES]] = {}
+        self._late: dict[int, dict[str, STORE_TYPES]] = {}  # values of runs already written
+        self._last_written = -1
+        self._runs = 0
+        self._part = 0
+        self._files: dict[tuple[tuple[str, str], ...], list[Path]] = {}  # partition -> part files
+
+    def record(self, run: int, name: str, value: STORE_TYPES):
+        self._changed.setdefault(run, {})[name] = value
+
+    def next_run(self):
+        """Called when the run changes."""
+        self._runs += 1
+        if self._runs >= self.runs_per_part:
+            self.write()
+
+    def _partitions(
+        self, changed: dict[int, dict[str, STORE_TYPES]]
+    ) -> dict[tuple[tuple[str, str], ...], list[dict[str, STORE_TYPES]]]:
+        partitions: dict[tuple[tuple[str, str], ...], list[dict[str, STORE_TYPES]]] = {}
+        for run, values in changed.items():
+            keys: list[tuple[str, str]] = []
+            for key in self.partition_by:
+                if key == "session":
+                    keys.append(("session", self.session))
+                elif key == "run":
+                    keys.append(("run", str(run // self.runs_per_part * self.runs_per_part)))
+            if "test" not in self.partition_by:
+                partitions.setdefault(tuple(keys), []).append({"RUN": run, **values})
+                continue
+            by_test: dict[str, dict[str, STORE_TYPES]] = {}
+            for name, value in values.items():
+                test, sep, column = name.rpartition(".")
+                by_test.setdefault(test if sep else NO_TEST, {})[column] = value
+            for test, test_values in by_test.items():
+                test_keys = list(keys)
+                test_keys.insert(self.partition_by.index("test"), ("test", test))
+                partitions.setdefault(tuple(test_keys), []).append({"RUN": run, **test_values})
+        return partitions
+
+    def write(self):
+        """Write the recorded values as one part file per partition, values of written runs are kept."""
+        self._runs = 0
+        changed, self._changed = self._changed, {}
+        for run in [run for run in changed if run <= self._last_written]:
+            self._late.setdefault(run, {}).update(changed.pop(run))
+        if not changed:
+            return
+        self._last_written = max(self._last_written, max(changed))
+        for keys, rows in self._partitions(changed).items():
+            self._write_part(keys, rows)
+
+    def _write_part(self, keys: tuple[tuple[str, str], ...], rows: list[dict[str, STORE_TYPES]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        directory = self.path.joinpath(*(f"{key}={_escape(value)}" for key, value in keys))
+        directory.mkdir(parents=True, exist_ok=True)
+        file = directory / f"part-{self.session}-{self._part:05d}.parquet"
+        self._part += 1
+        pq.write_table(pa.Table.from_pylist(rows), file, **self.options)
+        self._files.setdefault(keys, []).append(file)
+
+    def _replace(self, file: Path, table: Any):
+        import pyarrow.parquet as pq
+
+        tmp = file.with_name(f".{file.name}.tmp")
+        pq.write_table(table, tmp, **self.options)
+        os.replace(tmp, file)
+
+    def _merge_late(self):
+        """Merge the values of runs which were already written into the rows of their part files."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        late, self._late = self._late, {}
+        for keys, rows in self._partitions(late).items():
+            by_run = {row["RUN"]: row for row in rows}
+            for file in self._files.get(keys, []):
+                table = pq.ParquetFile(file).read()
+                if by_run.keys().isdisjoint(table.column("RUN").to_pylist()):
+                    continue
+                merged = table.to_pylist()
+                for row in merged:
+                    row.update(by_run.pop(row["RUN"], {}))
+                self._replace(file, pa.Table.from_pylist(merged))
+            if by_run:
+                self._write_part(keys, list(by_run.values()))
+
+    def _unify(self, files: list[Path]):
+        """Rewrite the parts which do not have the columns of all parts, '_metadata' needs one schema."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schemas = [pq.read_schema(file) for file in files]
+        try:
+            schema = pa.unify_schemas(schemas, promote_options="permissive")
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            return  # '_metadata' is not written
+        for file, file_schema in zip(files, schemas):
+            if not file_schema.equals(schema):
+                self._replace(file, conform_table(pq.ParquetFile(file).read(), schema))
+
+    def close(self):
+        """Write the remaining values and the metadata files."""
+        import pyarrow.parquet as pq
+
+        self.write()
+        if self._late:
+            self._merge_late()
+        files = [file for part_files in self._files.values() for file in part_files]
+        if not files:
+            return
+        self._unify(files)
+        metadata = []
+        for file in files:
+            file_metadata = pq.read_metadata(file)
+            file_metadata.set_file_path(file.relative_to(self.path).as_posix())
+            metadata.append(file_metadata)
+        write_metadata(self.path, metadata)
+
+
+def _escape(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_.[]" else f"%{ord(c):02X}" for c in value)
+
+
+def write_metadata(path: Path, metadata: list[Any]):
+    """Add the row groups of this session to '_metadata' and the schema to '_common_metadata'.
+
+    '_metadata' needs the same schema in all files, it is removed if the schemas differ. Both files are
+    removed if the types of a column can not be merged.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    metadata_path = path / "_metadata"
+    common_path = path / "_common_metadata"
+    schemas = [m.schema.to_arrow_schema() for m in metadata]
+    # without '_metadata' the row groups of earlier sessions are not known
+    complete = not common_path.exists()
+    if metadata_path.exists():
+        metadata = [pq.read_metadata(metadata_path)] + metadata
+        schemas.insert(0, metadata[0].schema.to_arrow_schema())
+        complete = True
+    elif common_path.exists():
+        schemas.insert(0, pq.read_schema(common_path))
+    try:
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        common_path.unlink(missing_ok=True)
+        metadata_path.unlink(missing_ok=True)
+        return
+    pq.write_metadata(schema, common_path)
+    if complete and all(s.equals(schemas[0]) for s in schemas[1:]):
+        combined = metadata[0]
+        for other in metadata[1:]:
+            combined.append_row_groups(other)
+        combined.write_metadata_file(metadata_path)
+    else:
+        metadata_path.unlink(missing_ok=True)
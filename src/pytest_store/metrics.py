@@ -0,0 +1,99 @@
+"""Resource metrics of the call phase of each test, one snapshot before and one after the call."""
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any, Callable, Sequence
+
+import pytest
+
+from .store import store
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None  # type: ignore[assignment]
+
+METRICS = ("duration", "cpu", "rss", "io")
+DEFAULT_METRICS = ("duration", "cpu", "rss")
+
+
+def parse_metrics(value: str) -> tuple[str, ...]:
+    """Comma separated metric names, 'all' for every metric and 'default' for duration, cpu and rss."""
+    metrics: list[str] = []
+    for name in value.replace(" ", "").lower().split(","):
+        if name in ("", "default", "true", "1"):
+            names: Sequence[str] = DEFAULT_METRICS
+        elif name == "all":
+            names = METRICS
+        elif name in METRICS:
+            names = (name,)
+        else:
+            raise pytest.UsageError(f"Store metric '{name}' does not exist, use {', '.join(METRICS)} or all.")
+        metrics.extend(n for n in names if n not in metrics)
+    return tuple(metrics)
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of the process in bytes."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    import psutil
+
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss)
+
+
+def _io_counters() -> tuple[int, int]:
+    import psutil
+
+    counters = psutil.Process().io_counters()
+    return counters.read_bytes, counters.write_bytes
+
+
+SNAPSHOTS: dict[str, Callable[[], Any]] = {
+    "duration": time.perf_counter,
+    "cpu": time.process_time,
+    "rss": _peak_rss,
+    "io": _io_counters,
+}
+
+
+class MetricsHooks:
+    """Registered if '--store-metrics' is set, writes the metrics with the prefix of the test."""
+
+    def __init__(self, metrics: Sequence[str]):
+        if "io" in metrics:
+            try:
+                import psutil
+            except ImportError as e:
+                raise pytest.UsageError("Store metric 'io' requires 'psutil'.") from e
+            if not hasattr(psutil.Process, "io_counters"):
+                raise pytest.UsageError("Store metric 'io' is not supported on this platform.")
+        self.metrics = tuple(metrics)
+        self._snapshots: list[Callable[[], Any]] = [SNAPSHOTS[name] for name in self.metrics]
+
+    def _snapshot(self) -> list[Any]:
+        return [snapshot() for snapshot in self._snapshots]
+
+    def values(self, before: list[Any], after: list[Any]) -> dict[str, Any]:
+        values: dict[str, Any] = {}
+        for name, start, end in zip(self.metrics, before, after):
+            if name == "io":
+                values["io_read"] = end[0] - start[0]
+                values["io_write"] = end[1] - start[1]
+            elif name == "rss":
+                values["rss_peak"] = end - start
+            elif name == "cpu":
+                values["cpu_time"] = end - start
+            else:
+                values[name] = end - start
+        return values
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item):
+        before = self._snapshot()
+        yield
+        after = self._snapshot()
+        store.set_many(self.values(before, after))
@@ -0,0 +1,90 @@
+"""Self instrumentation, measures the time spent in the plugin hooks and the store calls."""
+from __future__ import annotations
+
+import functools
+from time import perf_counter_ns
+from typing import Any, Callable, Generator
+
+OVERHEAD_STORE = "_store_overhead"
+
+
+def _percentile(values: list[int], q: float) -> int:
+    return values[int(q * (len(values) - 1))]
+
+
+class Overhead:
+    """Durations in nanoseconds per hook or store call."""
+
+    def __init__(self):
+        self.timings: dict[str, list[int]] = {}
+
+    def add(self, name: str, duration: int):
+        self.timings.setdefault(name, []).append(duration)
+
+    def wrap(self, func: Callable, name: str) -> Callable:
+        timings = self.timings.setdefault(name, [])
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.append(perf_counter_ns() - start)
+
+        return timed
+
+    def wrap_hookwrapper(self, func: Callable, name: str) -> Callable:
+        """Wrap a generator hook, the code before and after 'yield' is measured as one call."""
+        timings = self.timings.setdefault(name, [])
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs) -> Generator[None, Any, None]:
+            start = perf_counter_ns()
+            gen = func(*args, **kwargs)
+            next(gen)
+            duration = perf_counter_ns() - start
+            outcome = yield
+            start = perf_counter_ns()
+            try:
+                gen.send(outcome)
+            except StopIteration:
+                pass
+            finally:
+                timings.append(duration + perf_counter_ns() - start)
+
+        return timed
+
+    def summary(self) -> list[tuple[str, int, int, int, int, int, int]]:
+        """'(name, calls, total, p50, p90, p99, max)' per name, in nanoseconds."""
+        rows = []
+        for name, timings in self.timings.items():
+            if not timings:
+                continue
+            values = sorted(timings)
+            rows.append(
+                (
+                    name,
+                    len(values),
+                    sum(values),
+                    _percentile(values, 0.5),
+                    _percentile(values, 0.9),
+                    _percentile(values, 0.99),
+                    values[-1],
+                )
+            )
+        return rows
+
+    def to_string(self, tests: int = 0) -> str:
+        lines = [f"{'':<30} {'calls':>8} {'total ms':>10} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'max us':>9}"]
+        total = 0
+        for name, calls, sum_ns, p50, p90, p99, max_ns in self.summary():
+            if name.startswith("pytest_runtest_"):
+                total += sum_ns
+            lines.append(
+                f"{name:<30} {calls:>8} {sum_ns / 1e6:>10.2f} {p50 / 1e3:>9.1f} {p90 / 1e3:>9.1f} "
+                f"{p99 / 1e3:>9.1f} {max_ns / 1e3:>9.1f}"
+            )
+        if tests:
+            lines.append(f"\nPer test hooks {total / 1e6:.2f} ms, {total / tests / 1e3:.1f} us per test ({tests} tests)")
+        return "\n".join(lines) + "\n"
@@ -1,23 +1,28 @@
 # -*- coding: utf-8 -*-
 
-import os
 from typing import Callable, Optional, Union
-import warnings
-from click import UsageError
 import pytest
 
-import pathlib
 from .store import store
+from .stores._store_base import SaveError, SaveSettings, StoreBase
 from .stores import Stores
-from rich import print
+from .xdist_plugin import XdistStoreHooks, is_xdist_worker, send_rows
+from .overhead import OVERHEAD_STORE, Overhead
+from .metrics import MetricsHooks, parse_metrics
+from .sampler import Sampler
+from .dataset import DATASET_FORMATS
+from .retention import AGGREGATES_STORE
+import functools
+import json
 import re
-from icecream import ic
+import sys
 
 from _pytest.config import notset, Notset
 from _pytest.terminal import TerminalReporter
 
 item_pass_key = pytest.StashKey[bool]()
 all_pass_key = pytest.StashKey[dict]()
+overhead_key = pytest.StashKey[Overhead]()
 
 # item stash attriutes
 store_testname_attr = "_store_testname"
@@ -38,12 +43,76 @@ def pytest_addoption(parser):
     )
     group.addoption("--store-save-format", action="store", help="Save format.")
     group.addoption("--store-save-force", action="store_true", help="Overwrite exisintg file")
+    group.addoption(
+        "--store-save-append",
+        action="store_true",
+        help="Append the new runs to an existing file (parquet, sqlite, jsonl, arrows) and continue its run numbers.",
+    )
+    group.addoption(
+        "--store-partition-by",
+        action="store",
+        help="Partitions of the 'dataset' save format: session, run and/or test (default: session).",
+    )
+    group.addoption(
+        "--store-partition-runs",
+        action="store",
+        type=int,
+        help="Write a part file of the 'dataset' save format every N runs (default: 1000).",
+    )
+    group.addoption(
+        "--store-load",
+        action="store",
+        help="Load the runs of an Arrow IPC file (.arrow, .ipc, .feather) and continue after them.",
+    )
+    group.addoption(
+        "--store-checkpoint",
+        action="store",
+        help="Append the values changed since the last checkpoint to this JSON Lines file.",
+    )
+    group.addoption("--store-checkpoint-runs", action="store", type=int, help="Write a checkpoint every N runs.")
+    group.addoption(
+        "--store-checkpoint-interval", action="store", type=float, help="Write a checkpoint every N seconds."
+    )
+    group.addoption(
+        "--store-checkpoint-resume", action="store_true", help="Load the checkpoint file and continue after its runs."
+    )
+    group.addoption(
+        "--store-keep-runs",
+        action="store",
+        type=int,
+        help="Keep only the last N runs in memory, older runs are appended to the save file and aggregated.",
+    )
+    group.addoption(
+        "--store-metrics",
+        action="store",
+        help="Store resource metrics of each test call: duration, cpu, rss, io, all or default (duration,cpu,rss).",
+    )
+    group.addoption(
+        "--store-thread-safe",
+        action="store_true",
+        help="Take the test and run from a context variable and merge the writes of all threads under a lock.",
+    )
+    group.addoption(
+        "--store-overhead", action="store_true", help="Measure the time spent in the store hooks and calls."
+    )
 
     parser.addini("store_type", "Set store type")
     parser.addini("store_save", "Save file to path, format depends on the ending unless specified.")
     parser.addini("store_save_format", "Save format.")
-    parser.addini("store_save_options", "Additional options for saving")
+    parser.addini("store_save_options", "Additional options for saving, as JSON object.")
     parser.addini("store-save-force", help="Overwrite existing file")
+    parser.addini("store_save_append", "Append the new runs to an existing file.", type="bool", default=False)
+    parser.addini("store_partition_by", "Partitions of the 'dataset' save format: session, run and/or test.")
+    parser.addini("store_partition_runs", "Write a part file of the 'dataset' save format every N runs.")
+    parser.addini("store_load", "Load the runs of an Arrow IPC file and continue after them.")
+    parser.addini("store_checkpoint", "Append the values changed since the last checkpoint to this JSON Lines file.")
+    parser.addini("store_checkpoint_runs", "Write a checkpoint every N runs.")
+    parser.addini("store_checkpoint_interval", "Write a checkpoint every N seconds.")
+    parser.addini("store_keep_runs", "Keep only the last N runs in memory, older runs are appended and aggregated.")
+    parser.addini("store_metrics", "Store resource metrics of each test call: duration, cpu, rss, io or all.")
+    parser.addini("store_sample_interval", "Interval in seconds of the 'store_sampler' fixture (default: 0.1).")
+    parser.addini("store_thread_safe", "Merge the writes of all threads under a lock.", type="bool", default=False)
+    parser.addini("store_overhead", "Measure the time spent in the store hooks and calls.", type="bool", default=False)
 
 
 _OPTION_TYPE = Union[None, int, float, str, Notset]
@@ -55,10 +124,10 @@ def get_option_or_ini(
     option_value: _OPTION_TYPE = default
     if not (config.getoption(name) in (None, notset)):
         option_value = config.getoption(name)
-    elif not (config.getini(name) in (None, notset)):
+    elif not (config.getini(name) in (None, notset, "")):
         option_value = config.getini(name)  # type: ignore
 
-    if not (option_value in (None, notset)):
+    if not (option_value in (None, notset, "")):
         return format(option_value)
     return option_value
 
@@ -81,117 +150,339 @@ def set_save_to_file(config: pytest.Config):
     save_force = get_option_or_ini("store_save_force", config, default=False, format=bool)
     if not save_path:
         return
-    if not (config.getini("store_save_options") in (None, notset, "")):
-        # TODO: maybe need to parse to dict
-        options: dict = config.getini("store_save_options")  # type: ignore
-    else:
-        options = {}
-    store.save_to(str(save_path), format=save_format, force=bool(save_force), options=options)
+    options: dict = {}
+    ini_options = config.getini("store_save_options")
+    if not (ini_options in (None, notset, "")):
+        try:
+            options = json.loads(ini_options) if isinstance(ini_options, str) else dict(ini_options)  # type: ignore
+        except ValueError as e:
+            raise pytest.UsageError(f"store_save_options must be a JSON object: {e}") from e
+    if save_format in DATASET_FORMATS:
+        options = {
+            **options,
+            "partition_by": get_option_or_ini("store_partition_by", config, default="session"),
+            "runs_per_part": get_option_or_ini("store_partition_runs", config, default=1000, format=int),
+        }
+    append = config.getoption("store_save_append") or config.getini("store_save_append")
+    store.save_to(str(save_path), format=save_format, force=bool(save_force), options=options, append=bool(append))
+
+
+def set_load(config: pytest.Config):
+    path = get_option_or_ini("store_load", config, default=None)
+    if path:
+        store.load(str(path))
+
+
+def set_checkpoint(config: pytest.Config):
+    path = get_option_or_ini("store_checkpoint", config, default=None)
+    if not path:
+        return
+    store.set_checkpoint(
+        str(path),
+        every_runs=get_option_or_ini("store_checkpoint_runs", config, default=0, format=int),  # type: ignore[arg-type]
+        interval=get_option_or_ini("store_checkpoint_interval", config, default=0, format=float),  # type: ignore[arg-type]
+        resume=bool(config.getoption("store_checkpoint_resume")),
+    )
+
+
+def set_overhead(config: pytest.Config, hooks: "StoreTestHooks"):
+    """Time the per test hooks and the store calls, the hook methods are replaced on the instance."""
+    if not (config.getoption("store_overhead") or config.getini("store_overhead")):
+        return
+    overhead = config.stash[overhead_key] = Overhead()
+    for name in ("pytest_runtest_protocol", "pytest_runtest_makereport"):
+        setattr(hooks, name, overhead.wrap_hookwrapper(getattr(hooks, name), name))
+    for name in ("pytest_runtest_logreport", "pytest_sessionfinish"):
+        setattr(hooks, name, overhead.wrap(getattr(hooks, name), name))
+    for name in ("set", "set_many", "get", "save"):
+        setattr(store, name, overhead.wrap(getattr(store, name), f"Store.{name}"))
+
+
+def set_keep_runs(config: pytest.Config):
+    keep_runs = get_option_or_ini("store_keep_runs", config, default=0, format=int)
+    if keep_runs:
+        count = config.getoption("count", None)  # pytest-repeat
+        if count is not None and count > 1 and config.getoption("repeat_scope", None) != "session":
+            # the runs start again for each test, class or module and dropped runs would be written again
+            raise pytest.UsageError("--store-keep-runs with --count needs '--repeat-scope session'.")
+        try:
+            store.set_keep_runs(keep_runs)  # type: ignore[arg-type]
+        except UserWarning as e:
+            raise pytest.UsageError(f"--store-keep-runs: {e}") from e
+
+
+def save_aggregates():
+    """Save the running aggregates, one row per name, next to each save file of the active store."""
+    aggregates = store.aggregates()
+    if not aggregates or store.store is None:
+        return
+    store.add_store(AGGREGATES_STORE)
+    aggregates_store = store._stores[AGGREGATES_STORE]
+    for idx, (name, values) in enumerate(aggregates.items()):
+        aggregates_store.set_index(idx)
+        aggregates_store.set_many({"name": name, **values})
+    _save_next_to_files(aggregates_store, AGGREGATES_STORE)
+
+
+def _save_next_to_files(other: StoreBase, name: str):
+    """Save 'other' as '<stem><name><suffix>' next to each save file of the active store, the files are replaced.
+
+    The results are added to the results of the active store, they are shown in the terminal summary.
+    """
+    for settings in store.store._save_settings_list:  # type: ignore[union-attr]
+        path = settings.path.with_name(f"{settings.path.stem}{name}{settings.path.suffix}")
+        if path.is_file():
+            path.unlink()
+        try:
+            other.save(SaveSettings(path=path, name=name, format=settings.format))
+        finally:
+            store.store._save_results.extend(other.save_results)  # type: ignore[union-attr]
+
+
+def set_metrics(config: pytest.Config):
+    metrics = get_option_or_ini("store_metrics", config, default=None)
+    if metrics and str(metrics).lower() not in ("false", "0", "none"):
+        config.pluginmanager.register(MetricsHooks(parse_metrics(str(metrics))), "store-metrics")
+
+
+def save_overhead(overhead: Overhead):
+    """Save the raw timings to the '_store_overhead' store, next to each save file of the active store."""
+    if store.store is None or not store.store._save_settings_list:
+        return
+    store.add_store(OVERHEAD_STORE)
+    overhead_store = store._stores[OVERHEAD_STORE]
+    for name, timings in overhead.timings.items():
+        for idx, duration in enumerate(timings):
+            overhead_store.set_index(idx)
+            overhead_store.set(name, duration)
+    _save_next_to_files(overhead_store, OVERHEAD_STORE)
 
 
 def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "store_sampler(interval=0.1, size=10000, **funcs): sample the functions in the background "
+        "with the 'store_sampler' fixture.",
+    )
     set_store_obj(config)
+    if store.store is None:
+        return  # no store, leave out all per test hooks
+    if config.getoption("store_thread_safe") or config.getini("store_thread_safe"):
+        store.set_thread_safe()
+    hooks = StoreTestHooks()
+    set_overhead(config, hooks)
+    config.pluginmanager.register(hooks, "store-test-hooks")
+    set_metrics(config)
+    if is_xdist_worker(config):
+        return  # the controller saves the merged values
+    set_load(config)  # before an existing save file is moved
     set_save_to_file(config)
+    set_checkpoint(config)
+    set_keep_runs(config)
+    if config.pluginmanager.hasplugin("xdist"):
+        config.pluginmanager.register(XdistStoreHooks(all_pass_key), "store-xdist")
+
+
+@pytest.fixture
+def store_sampler(request: pytest.FixtureRequest):
+    """Sample functions in a background thread, each series is stored as list at the end of the test.
+
+    Functions are added with 'store_sampler.add(name, func)' or the 'store_sampler' marker.
+    """
+    marker = request.node.get_closest_marker("store_sampler")
+    kwargs = dict(marker.kwargs) if marker is not None else {}
+    interval = kwargs.pop("interval", None)
+    if interval is None:
+        interval = get_option_or_ini("store_sample_interval", request.config, default=0.1, format=float)
+    sampler = Sampler(interval=interval, **kwargs)
+    yield sampler
+    sampler.stop()
+    for name, values in sampler.series().items():
+        store.set(name, values)
 
 
 @pytest.hookimpl(trylast=True)
 def pytest_terminal_summary(terminalreporter: TerminalReporter, exitstatus, config: pytest.Config):
     # reports = terminalreporter.getreports("")
     # content = os.linesep.join(text for report in reports for secname, text in report.sections)
-    if store.__stores__ is not None:
+    if store.store is not None:
         terminalreporter.ensure_newline()
         terminalreporter.section("stored values summary", sep="=", blue=True, bold=True)
         terminalreporter.write(store.to_string())
-        if store.store is not None and store.store._save_settings_list:
-            terminalreporter.write("\nSaved to '")
-            terminalreporter.write(
-                ", ".join([str(s.path) for s in store.store._save_settings_list]), bold=True, green=True
-            )
-            terminalreporter.write("'\n")
+        if store.store is not None and store.store.save_results:
+            terminalreporter.write("\nSaved to:\n")
+            for result in store.store.save_results:
+                terminalreporter.write(f"  {result.settings.path}", bold=True, green=result.error is None)
+                if result.error is None:
+                    terminalreporter.write(f" ({result.duration * 1000:.1f} ms)\n")
+                else:
+                    terminalreporter.write(f" failed: {type(result.error).__name__}: {result.error}\n", red=True)
+    if store.retention is not None and store.retention.dropped:
+        terminalreporter.write(
+            f"\n{store.retention.dropped} runs dropped from memory (--store-keep-runs {store.retention.keep_runs}).\n"
+        )
+    if store.retention is not None and store.retention.stopped:
+        terminalreporter.write("\nRuns could not be appended, no more runs were dropped from memory.\n", red=True)
+    overhead = config.stash.get(overhead_key, None)
+    if overhead is not None:
+        terminalreporter.ensure_newline()
+        terminalreporter.section("store overhead", sep="=", blue=True, bold=True)
+        terminalreporter.write(overhead.to_string(tests=len(overhead.timings.get("pytest_runtest_protocol", []))))
+
+
+def pytest_unconfigure(config: pytest.Config):
+    if config.stash.get(overhead_key, None) is not None:
+        for name in ("set", "set_many", "get", "save"):
+            store.__dict__.pop(name, None)
+
+
+_REPEAT_PATTERN = re.compile(r"(\d+)-\d+\]")
+
+
+@functools.lru_cache(maxsize=None)
+def _repeat_testname(base: str) -> str:
+    """Test name from the item name up to the pytest-repeat count, e.g. 'test_a[' or 'test_a[x-'."""
+    name = base[:-1] if base.endswith("[") else base[:-1] + "]"
+    return sys.intern(name.replace("test_", ""))
 
 
 def _use_pytest_repeat(item, count):
-    pat = r"(\d+)-\d+\]"
-    m = re.search(pat, item.name)
+    m = _REPEAT_PATTERN.search(item.name)
     if getattr(item, store_run_attr, None) is None:
         if m and m.group(1):
             idx = int(m.group(1)) - 1
             setattr(item, store_run_attr, int(idx))
     if getattr(item, store_testname_attr, None) is None:
-        if m:
-            setattr(
-                item,
-                store_testname_attr,
-                item.name.replace(f"[{m.group(0)}", "").replace(f"-{m.group(0)}", "]").replace("test_", ""),
-            )
-
-
-@pytest.hookimpl(hookwrapper=True)
-def pytest_runtest_protocol(item: pytest.Item, nextitem: pytest.Item):
-    store_run = getattr(item, store_run_attr, 0)
-    if store.get_index() != store_run:
-        store.set_index(store_run)
-        # if store.get("PASS", default=None, prefix="") is None:
-        #    if (
-        #        item.config.getoption("repeat_scope", None) == "session"
-        #        or item.config.getoption("rerun_time", None)
-        #        or item.config.getoption("rerun_iter", None)
-        #    ):
-        #        # store.set("PASS", bool(item.session.stash.get(all_pass_key, True)), prefix="")
-        #        store.set("PASS", True, prefix="")
-        #        # item.session.stash[all_pass_key] = True
-    store.item = item
-    yield
-
-
-def pytest_collection_modifyitems(session: pytest.Session, config: pytest.Config, items: list[pytest.Item]) -> None:
-    for item in items:
-        # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # support for pytest-rerun
-        # rerun_for = config.getoption("rerun_for", None)
-        # if rerun_for is not None:
-        #    _use_pytest_rerun(item, rerun_for)
-        # support for pytest-repeat
-        if getattr(item, store_testname_attr, None) is None:
-            count = config.getoption("count", 0)
-            if count is not None and count > 1:
-                _use_pytest_repeat(item, count)
+        if m and item.name[m.start() - 1] in "[-":
+            setattr(item, store_testname_attr, _repeat_testname(item.name[: m.start()]))
+
+
+class StoreTestHooks:
+    """Per test and session hooks, only registered if a store is active."""
+
+    def pytest_collection_modifyitems(
+        self, session: pytest.Session, config: pytest.Config, items: list[pytest.Item]
+    ) -> None:
+        for item in items:
             # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        if getattr(item, store_testname_attr, None) is None:
-            setattr(item, store_testname_attr, item.name.replace("test_", ""))
-        store_run = getattr(item, store_run_attr, None)
-        if store_run is None:
-            setattr(item, store_run_attr, 0)
-        if getattr(item, store_run_attr, None) is None:
-            setattr(item, store_run_attr, 0)
-
-
-def pytest_runtest_logreport(report: pytest.TestReport):
-    item = store.item
-    if report.outcome == "skipped" or getattr(item, "_skipped", False):
-        setattr(item, "_skipped", True)
-        return
-    name = "pass"
-    if report.when in ("setup", "teardown"):
-        name = f"{name}_{report.when}"
-    if item is not None:
-        # if not report.passed:
-        #    item.session.stash[item_pass_key] = False
-        # item.stash[item_pass_key] = item.stash.get(item_pass_key, True) and report.passed
-        store.set(name, report.passed)
-        # store.set(f"outcome_{report.when}", report.outcome)
-
-
-@pytest.hookimpl(tryfirst=True, hookwrapper=True)
-def pytest_runtest_makereport(item: pytest.Item, call):
-    outcome = yield
-    report: pytest.TestReport = outcome.get_result()
-    item.stash[item_pass_key] = item.stash.get(item_pass_key, True) and report.passed
-    if item.session.stash.get(all_pass_key, None) is None:
-        item.session.stash[all_pass_key] = {}
-    if report.when in ("call",):
-        prev = item.session.stash.get(all_pass_key, {}).get(getattr(item, store_run_attr, 0), True)
-        item.session.stash[all_pass_key][getattr(item, store_run_attr, 0)] = prev and report.passed
+            # support for pytest-rerun
+            # rerun_for = config.getoption("rerun_for", None)
+            # if rerun_for is not None:
+            #    _use_pytest_rerun(item, rerun_for)
+            # support for pytest-repeat
+            if getattr(item, store_testname_attr, None) is None:
+                count = config.getoption("count", 0)
+                if count is not None and count > 1:
+                    _use_pytest_repeat(item, count)
+                # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            if getattr(item, store_testname_attr, None) is None:
+                setattr(item, store_testname_attr, item.name.replace("test_", ""))
+            store_run = getattr(item, store_run_attr, None)
+            if store_run is None:
+                setattr(item, store_run_attr, 0)
+            if getattr(item, store_run_attr, None) is None:
+                setattr(item, store_run_attr, 0)
+            # the prefix is not formatted again for each value
+            store.intern_prefix(item)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: pytest.Item, nextitem: pytest.Item):
+        store_run = getattr(item, store_run_attr, 0)
+        if store.get_index() != store_run:
+            if store.retention is not None and _add_all_pass(item.session):
+                _set_run_pass(item.session)
+            store.set_index(store_run)
+            # if store.get("PASS", default=None, prefix="") is None:
+            #    if (
+            #        item.config.getoption("repeat_scope", None) == "session"
+            #        or item.config.getoption("rerun_time", None)
+            #        or item.config.getoption("rerun_iter", None)
+            #    ):
+            #        # store.set("PASS", bool(item.session.stash.get(all_pass_key, True)), prefix="")
+            #        store.set("PASS", True, prefix="")
+            #        # item.session.stash[all_pass_key] = True
+        store.item = item
+        yield
+        store.flush()
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport):
+        item = store.item
+        if item is None:  # e.g. on the xdist controller
+            return
+        if report.outcome == "skipped" or getattr(item, "_skipped", False):
+            setattr(item, "_skipped", True)
+            return
+        name = "pass"
+        if report.when in ("setup", "teardown"):
+            name = f"{name}_{report.when}"
+        if item is not None:
+            # if not report.passed:
+            #    item.session.stash[item_pass_key] = False
+            # item.stash[item_pass_key] = item.stash.get(item_pass_key, True) and report.passed
+            store.set(name, report.passed)
+            # store.set(f"outcome_{report.when}", report.outcome)
+
+    @pytest.hookimpl(tryfirst=True, hookwrapper=True)
+    def pytest_runtest_makereport(self, item: pytest.Item, call):
+        outcome = yield
+        report: pytest.TestReport = outcome.get_result()
+        item.stash[item_pass_key] = item.stash.get(item_pass_key, True) and report.passed
+        if item.session.stash.get(all_pass_key, None) is None:
+            item.session.stash[all_pass_key] = {}
+        if report.when in ("call",):
+            prev = item.session.stash.get(all_pass_key, {}).get(getattr(item, store_run_attr, 0), True)
+            item.session.stash[all_pass_key][getattr(item, store_run_attr, 0)] = prev and report.passed
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: Union[int, pytest.ExitCode]) -> None:
+        store.flush()
+        if is_xdist_worker(session.config):
+            # merged and saved by the controller
+            send_rows(session.config, session.stash.get(all_pass_key, {}))
+            return
+        if _add_all_pass(session):
+            # store.set("PASS", bool(session.stash.get(all_pass_key, True)), prefix="")
+            # session.stash[item_pass_key] = True
+            # for item in session.items:
+            #    _idx = getattr(item, store_run_attr, None)
+            #    if _idx is None:
+            #        continue
+            #    store.set_index(_idx)
+            #    item_passed = item.stash.get(item_pass_key, False)
+            #    prevs_passed = bool(store.get("PASS", True, prefix=""))
+            #    # store.append("PASSprevs", prevs_passed, prefix="")
+            #    # store.append("PASSitems", item_passed, prefix="")
+            #    store.set("PASS", item_passed and prevs_passed, prefix="")
+
+            store.set_column("PASS", session.stash.get(all_pass_key, {}), prefix="")
+        store.checkpoint()
+        failed = _save_failed(store.save)
+        if store.retention is not None:
+            failed = _save_failed(save_aggregates) or failed
+        overhead = session.config.stash.get(overhead_key, None)
+        if overhead is not None:
+            failed = _save_failed(functools.partial(save_overhead, overhead)) or failed
+        if failed and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+        # store_to_file(session.config)
+
+
+def _save_failed(save: Callable[[], None]) -> bool:
+    """Call 'save', a 'SaveError' is reported per file in the terminal summary."""
+    try:
+        save()
+    except SaveError:
+        return True
+    return False
+
+
+def _set_run_pass(session: pytest.Session):
+    """Set 'PASS' of the current run before it can be dropped from memory ('--store-keep-runs')."""
+    all_passed = session.stash.get(all_pass_key, {})
+    run = store.get_index()
+    if run in all_passed:
+        store.set("PASS", all_passed[run], prefix="")
+    for dropped in [r for r in all_passed if store.retention.is_dropped(r + store.run_offset)]:  # type: ignore[union-attr]
+        del all_passed[dropped]
 
 
 def _add_all_pass(session):
@@ -202,28 +493,5 @@ def _add_all_pass(session):
     )
 
 
-def pytest_sessionfinish(session: pytest.Session, exitstatus: Union[int, pytest.ExitCode]) -> None:
-    if _add_all_pass(session):
-        # store.set("PASS", bool(session.stash.get(all_pass_key, True)), prefix="")
-        # session.stash[item_pass_key] = True
-        # for item in session.items:
-        #    _idx = getattr(item, store_run_attr, None)
-        #    if _idx is None:
-        #        continue
-        #    store.set_index(_idx)
-        #    item_passed = item.stash.get(item_pass_key, False)
-        #    prevs_passed = bool(store.get("PASS", True, prefix=""))
-        #    # store.append("PASSprevs", prevs_passed, prefix="")
-        #    # store.append("PASSitems", item_passed, prefix="")
-        #    store.set("PASS", item_passed and prevs_passed, prefix="")
-
-        all_passed = session.stash.get(all_pass_key, {})
-        for idx, passed in all_passed.items():
-            store.set_index(idx)
-            store.set("PASS", passed, prefix="")
-    store.save()
-    # store_to_file(session.config)
-
-
 # def pytest_runtest_teardown(item: pytest.Item) -> None:  # noqa: ARG001
 #    store.item = None
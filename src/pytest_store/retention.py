@@ -0,0 +1,206 @@
+"""Keep only the last runs in memory, older runs are appended to the save files and summarized in running aggregates."""
+from __future__ import annotations
+
+import copy
+import math
+import time
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .types import STORE_TYPES
+from .stores._append import APPEND_FORMATS
+from .stores._store_base import SaveResult
+
+if TYPE_CHECKING:
+    from .stores._store_base import StoreBase
+
+AGGREGATES_STORE = "_store_aggregates"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class P2Quantile:
+    """Approximate quantile 'p' with the P² algorithm (Jain and Chlamtac, 1985), five markers in constant memory."""
+
+    __slots__ = ("p", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.heights: list[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float):
+        q = self.heights
+        if len(q) < 5:
+            q.append(value)
+            if len(q) == 5:
+                q.sort()
+            return
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self.heights) < 5:  # exact for the first values
+            values = sorted(self.heights)
+            return values[int(self.p * (len(values) - 1))] if values else None
+        return self.heights[2]
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min, max and approximate quantiles of the values of one name."""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max", "quantiles")
+
+    def __init__(self, quantiles: Iterable[float] = QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = [P2Quantile(q) for q in quantiles]
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for quantile in self.quantiles:
+            quantile.add(value)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self) -> dict[str, STORE_TYPES]:
+        values: dict[str, STORE_TYPES] = {
+            "count": self.count,
+            "mean": self.mean,
+            "std": math.sqrt(self.variance),
+            "min": self.min,
+            "max": self.max,
+        }
+        for quantile in self.quantiles:
+            values[f"p{quantile.p * 100:g}"] = quantile.value
+        return values
+
+
+class Retention:
+    """Keep the last 'keep_runs' runs of a store in memory.
+
+    Older runs are removed in batches of 'keep_runs / 10' runs. They are added to the running aggregates
+    and appended to the save files, which must be formats that can be appended (see 'APPEND_FORMATS').
+    Numeric and bool values are aggregated over all runs. If runs can not be appended, they are kept
+    and no runs are dropped anymore, the error is raised by 'Store.save()'.
+    """
+
+    def __init__(self, keep_runs: int):
+        self.keep_runs = max(1, int(keep_runs))
+        self._step = max(1, self.keep_runs // 10)
+        self._runs: dict[int, None] = {}  # runs in memory, least recently used first
+        self._dropped_until = 0  # all runs below are dropped, unless used again
+        self.dropped = 0
+        self.aggregates: dict[str, RunningStats] = {}
+        self.errors: list[SaveResult] = []
+        self.stopped = False  # an append failed, all following runs are kept in memory
+
+    def next_run(self, store: "StoreBase", run: int):
+        """Called when the run changes, a run can not be used again once it was dropped."""
+        if self.is_dropped(run):
+            raise UserWarning(
+                f"Run {run} was already dropped from memory, keeping the last runs needs runs which only go up "
+                "(e.g. '--repeat-scope session' with pytest-repeat)."
+            )
+        if self.stopped:
+            return
+        # most recently used run last
+        self._runs.pop(run, None)
+        self._runs[run] = None
+        if len(self._runs) > self.keep_runs + self._step:
+            self.drop(store, list(self._runs)[: len(self._runs) - self.keep_runs])
+
+    def is_dropped(self, run: int) -> bool:
+        return run < self._dropped_until and run not in self._runs
+
+    def drop(self, store: "StoreBase", runs: list[int]):
+        """Aggregate 'runs', append them to the save files and remove them from the store."""
+        drop = set(runs)
+        failed = False
+        for cfg in store._save_settings_list:
+            if cfg.format not in APPEND_FORMATS:
+                continue
+            result = SaveResult(cfg)
+            start = time.perf_counter()
+            try:
+                store._append(cfg, runs=drop)
+            except Exception as e:
+                result.error = e
+                self.errors.append(result)
+                failed = True
+            else:
+                # the remaining runs are appended at the end
+                cfg.append = True
+                cfg.append_from = max(cfg.append_from, max(drop) + 1)
+            result.duration = time.perf_counter() - start
+        if failed:
+            # the runs would be lost, the files which failed get them with the final save
+            self.stopped = True
+            return
+        self._add(values for _, values in store._select_rows(drop))
+        store.drop_runs(drop)
+        for run in runs:
+            del self._runs[run]
+        self._dropped_until = max(self._dropped_until, max(drop) + 1)
+        self.dropped += len(drop)
+
+    def _add(self, rows: Iterable[dict[str, STORE_TYPES]]):
+        for values in rows:
+            for name, value in values.items():
+                # bool is an int as well
+                if isinstance(value, (int, float)) and value == value:
+                    stats = self.aggregates.get(name)
+                    if stats is None:
+                        stats = self.aggregates[name] = RunningStats()
+                    stats.add(float(value))
+
+    def summary(self, store: "StoreBase") -> dict[str, dict[str, STORE_TYPES]]:
+        """Aggregates per name over the dropped runs and the runs still in memory."""
+        aggregates = self.aggregates
+        self.aggregates = copy.deepcopy(aggregates)
+        try:
+            self._add(values for run, values in store.rows() if not self.is_dropped(run))
+            return {name: stats.to_dict() for name, stats in self.aggregates.items()}
+        finally:
+            self.aggregates = aggregates
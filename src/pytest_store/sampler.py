@@ -0,0 +1,106 @@
+"""Background sampler, calls functions at an interval and keeps the values in ring buffers."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .types import STORE_TYPES, STORE_TYPES_SINGLE
+
+TIME_NAME = "sample_time"
+
+
+class RingBuffer:
+    """Fixed size buffer with a single writer, the oldest values are overwritten once it is full.
+    Written by the sampler thread only and read after the thread stopped, hence no lock is needed."""
+
+    __slots__ = ("_values", "_count")
+
+    def __init__(self, size: int):
+        self._values: list[Any] = [None] * size
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, len(self._values))
+
+    def append(self, value: Any):
+        self._values[self._count % len(self._values)] = value
+        self._count += 1
+
+    def values(self) -> list[Any]:
+        size = len(self._values)
+        if self._count <= size:
+            return self._values[: self._count]
+        start = self._count % size
+        return self._values[start:] + self._values[:start]
+
+
+class Sampler:
+    """Call the functions every 'interval' seconds in a daemon thread, the first sample is taken at start.
+
+    The series are written to the store at the end of the test, one list column per function
+    and 'sample_time' with the seconds since the start.
+    """
+
+    def __init__(self, interval: float = 0.1, size: int = 10_000, **funcs: Callable[[], STORE_TYPES]):
+        self.interval = interval
+        self.size = size
+        self._funcs: dict[str, Callable[[], STORE_TYPES]] = {}
+        self._buffers: dict[str, RingBuffer] = {TIME_NAME: RingBuffer(size)}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+        self._error: Optional[BaseException] = None
+        for name, func in funcs.items():
+            self.add(name, func)
+
+    def add(self, name: str, func: Callable[[], STORE_TYPES]):
+        """Sample 'func' as 'name', starts the thread if not yet running."""
+        if name in self._funcs or name == TIME_NAME:
+            raise ValueError(f"Sample name '{name}' is already used.")
+        self._buffers[name] = RingBuffer(self.size)
+        self._funcs[name] = func
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="pytest-store-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread, an error raised by a sampled function is raised here."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            self._sample()
+        except Exception as e:
+            self._error = e
+
+    def _sample(self):
+        time_buffer = self._buffers[TIME_NAME]
+        while True:
+            time_buffer.append(time.perf_counter() - self._start)
+            # samples are aligned to 'sample_time', functions added while sampling get 'None' first
+            for name, buffer in tuple(self._buffers.items()):
+                if name == TIME_NAME:
+                    continue
+                func = self._funcs.get(name)
+                while len(buffer) < len(time_buffer) - 1:
+                    buffer.append(None)
+                buffer.append(func() if func is not None else None)
+            if self._stop.wait(self.interval):
+                break
+
+    def series(self) -> dict[str, list[STORE_TYPES_SINGLE]]:
+        """Sampled values per name, only complete after 'stop()'."""
+        if not self._funcs:
+            return {}
+        return {name: buffer.values() for name, buffer in self._buffers.items()}
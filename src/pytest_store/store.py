@@ -1,15 +1,25 @@
+from collections import deque
 from contextlib import redirect_stdout
+from contextvars import ContextVar
 import io
+import sys
+import threading
+import time
 from pathlib import Path
-from re import S
-from typing import Any, Optional, Union
-import msgspec
-
+from typing import TYPE_CHECKING, Any, Optional, Union
 import pytest
 
-from icecream import ic
 from .types import STORE_TYPES
-from .stores._store_base import StoreBase, SaveSettings
+from .stores._store_base import SaveError, SaveResult, StoreBase, SaveSettings
+
+if TYPE_CHECKING:
+    from .checkpoint import Checkpoint
+    from .dataset import DatasetWriter
+    from .retention import Retention
+
+
+# item attribute with the resolved default prefix, '(template, prefix)'
+item_prefix_attr = "_store_prefix"
 
 
 class Store:
@@ -29,6 +39,20 @@ class Store:
         self._default_prefix = default_prefix
         self._item: Union[None, pytest.Item] = None
         self._save_to = []
+        self._names: dict[str, dict[str, str]] = {}  # prefix -> name -> interned 'prefix.name'
+        self._run_offset = 0
+        self._checkpoint: Optional["Checkpoint"] = None
+        self._datasets: list["DatasetWriter"] = []
+        # get every written value and the run changes, e.g. checkpoint and dataset writers
+        self._recorders: list[Union["Checkpoint", "DatasetWriter"]] = []
+        self._retention: Optional["Retention"] = None
+        self._thread_safe = False
+        self._context: ContextVar[Optional[tuple[Optional[pytest.Item], Optional[int]]]] = ContextVar(
+            f"pytest_store_{id(self)}", default=None
+        )
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._buffers: list[tuple[threading.Thread, deque]] = []
 
     def set_store(self, store: Optional[StoreBase], name=None):
         """Set store, optionally with different name. If it already exists it is overwritten. If set to 'None' the store is deleted."""
@@ -49,13 +73,31 @@ class Store:
         if _from in self._stores:
             self.set_store(type(self._stores[_from])(), name=name)
 
+    @property
+    def thread_safe(self) -> bool:
+        return self._thread_safe
+
+    def set_thread_safe(self, enabled: bool = True):
+        """In thread safe mode the item and run are taken from a context variable (copied into asyncio tasks)
+        and writes are collected per thread, they are merged into the store under one lock by 'flush()',
+        before reading and at the end of each test. 'set' and 'append' return the given value."""
+        if not enabled:
+            self.flush()
+        self._thread_safe = enabled
+
     @property
     def item(self) -> Union[pytest.Item, None]:
+        if self._thread_safe:
+            context = self._context.get()
+            if context is not None:
+                return context[0]
         return self._item
 
     @item.setter
     def item(self, item: pytest.Item):
         self._item = item
+        if self._thread_safe:
+            self._context.set((item, self.store._idx if self.store is not None else None))
 
     @property
     def store(self) -> Optional[StoreBase]:
@@ -68,38 +110,261 @@ class Store:
     @property
     def data(self) -> STORE_TYPES:
         if self.store is not None:
+            self.flush()
             return self.store.data
         return None
 
+    @property
+    def run_offset(self) -> int:
+        """Added to the run index, e.g. to continue after already stored runs."""
+        return self._run_offset
+
+    @run_offset.setter
+    def run_offset(self, offset: int):
+        self._run_offset = offset
+
     def set_index(self, run: int):
         if self.store is not None:
-            self.store.set_index(run)
+            if self._thread_safe:
+                with self._lock:
+                    self._set_index(run)
+                self._context.set((self._item, self.store._idx))
+            else:
+                self._set_index(run)
 
-    def get_index(self) -> int:
+    def _set_index(self, run: int):
         if self.store is not None:
-            return self.store._idx
+            if self._recorders and self.store._idx != run + self._run_offset:
+                for recorder in self._recorders:
+                    recorder.next_run()
+            self.store.set_index(run + self._run_offset)
+            if self._retention is not None:
+                self._retention.next_run(self.store, run + self._run_offset)
+
+    def get_index(self) -> int:
+        if self._thread_safe:
+            run = self._context_run()
+        else:
+            run = self.store._idx if self.store is not None else None
+        if run is not None:
+            return run - self._run_offset
         else:
             return 0
 
     def set(self, name: str, value: STORE_TYPES, prefix: str = "default"):
         if self.store is not None:
             name = self._get_name_with_prefix(name, prefix)
-            return self.store.set(name=name, value=value)
+            if self._thread_safe:
+                self._buffer().append(("set", self._active_store, self._context_run(), name, value))
+                return value
+            value = self.store.set(name=name, value=value)
+            if self._recorders:
+                self._record(self.store._idx, name, value)
+            return value
         return None
 
+    def set_many(self, values: dict[str, STORE_TYPES], prefix: str = "default") -> dict[str, STORE_TYPES]:
+        """Set several values of the current run in one call, the prefix is resolved once."""
+        if self.store is not None:
+            prefix = self._resolve_prefix(prefix)
+            if prefix:
+                values = {f"{prefix}.{name}": value for name, value in values.items()}
+            else:
+                values = dict(values)
+            if self._thread_safe:
+                self._buffer().append(("set_many", self._active_store, self._context_run(), None, values))
+                return values
+            values = self.store.set_many(values)
+            if self._recorders:
+                for name, value in values.items():
+                    self._record(self.store._idx, name, value)
+            return values
+        return {}
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES], prefix: str = "default"):
+        """Set 'name' for several runs at once ('run -> value'), the current run is kept."""
+        if self.store is None:
+            return
+        name = self._get_name_with_prefix(name, prefix)
+        values = {run + self._run_offset: value for run, value in values.items()}
+        if self._retention is not None:
+            values = {run: value for run, value in values.items() if not self._retention.is_dropped(run)}
+        self.flush()
+        with self._lock:
+            self.store.set_column(name, values)
+        if self._recorders:
+            for run, value in values.items():
+                self._record(run, name, value)
+
+    def record(self, *, _prefix: str = "default", **values: STORE_TYPES) -> dict[str, STORE_TYPES]:
+        """Same as 'set_many' with the values as keyword arguments, e.g. 'store.record(duration=1.2, cpu=0.8)'.
+
+        The prefix is given as '_prefix', so a value can be named 'prefix'.
+        """
+        return self.set_many(values, prefix=_prefix)
+
     def append(self, name: str, value: STORE_TYPES, prefix: str = "default"):
         if self.store is not None:
             name = self._get_name_with_prefix(name, prefix)
-            return self.store.append(name=name, value=value)
+            if self._thread_safe:
+                self._buffer().append(("append", self._active_store, self._context_run(), name, value))
+                return value
+            values = self.store.append(name=name, value=value)
+            if self._recorders:
+                self._record(self.store._idx, name, values)
+            return values
         return None
 
+    def _record(self, run: Optional[int], name: str, value: STORE_TYPES):
+        if run is None:
+            return
+        for recorder in self._recorders:
+            recorder.record(run, name, value)
+
+    def _context_run(self) -> Optional[int]:
+        context = self._context.get()
+        if context is not None:
+            return context[1]
+        return self.store._idx if self.store is not None else None
+
+    def _buffer(self) -> deque:
+        """Write buffer of the current thread, 'deque' allows to append and pop from different threads."""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = deque()
+            with self._lock:
+                self._buffers.append((threading.current_thread(), buffer))
+        return buffer
+
+    def flush(self):
+        """Merge the writes of all threads into the stores (thread safe mode only)."""
+        if not self._buffers:
+            return
+        with self._lock:
+            indexes: dict[str, Optional[int]] = {}
+            for _thread, buffer in self._buffers:
+                while buffer:
+                    op, store_name, run, name, value = buffer.popleft()
+                    target = self._stores.get(store_name)
+                    if target is None:
+                        continue
+                    if store_name not in indexes:
+                        indexes[store_name] = target._idx
+                    if run is not None and target._idx != run:
+                        target.set_index(run)
+                    if op == "set_many":
+                        value = target.set_many(value)
+                        if self._recorders and target is self.store:
+                            for many_name, many_value in value.items():
+                                self._record(target._idx, many_name, many_value)
+                        continue
+                    if op == "set":
+                        value = target.set(name=name, value=value)
+                    else:
+                        value = target.append(name=name, value=value)
+                    if self._recorders and target is self.store:
+                        self._record(target._idx, name, value)
+            for store_name, idx in indexes.items():
+                target = self._stores[store_name]
+                if idx is not None and target._idx != idx:
+                    target.set_index(idx)
+            # buffers of finished threads are empty now
+            self._buffers = [(thread, buffer) for thread, buffer in self._buffers if thread.is_alive() or buffer]
+
+    def set_checkpoint(
+        self, path: Union[None, str, Path], every_runs: int = 0, interval: float = 0, resume: bool = False
+    ):
+        """Write changed values to an append-only checkpoint file, with 'resume' the stored runs are loaded first."""
+        from .checkpoint import Checkpoint
+
+        if self._checkpoint is not None:
+            self._recorders.remove(self._checkpoint)
+            self._checkpoint = None
+        if path is None:
+            return
+        self._checkpoint = Checkpoint(path, every_runs=every_runs, interval=interval)
+        self._recorders.append(self._checkpoint)
+        if not resume:
+            self._checkpoint.clear()
+        elif self.store is not None:
+            rows = list(Checkpoint.read(path))
+            self.store.merge_rows(rows)
+            if rows:
+                self._run_offset = max(self._run_offset, max(run for run, _ in rows) + 1)
+
+    @property
+    def retention(self) -> Optional["Retention"]:
+        return self._retention
+
+    def set_keep_runs(self, keep_runs: Optional[int]):
+        """Keep only the last 'keep_runs' runs in memory, older runs are appended to the save files
+        and added to the running aggregates (see 'Retention'). 'None' or 0 keeps all runs."""
+        from .retention import Retention
+
+        retention = Retention(keep_runs) if keep_runs else None
+        if retention is not None and self.store is not None:
+            for settings in self.store._save_settings_list:
+                self._check_appendable(settings)
+            if self.store._idx is not None:
+                retention.next_run(self.store, self.store._idx)
+        self._retention = retention
+
+    @staticmethod
+    def _check_appendable(settings: SaveSettings):
+        """Dropped runs are only kept in save files which can be appended."""
+        from .stores._append import APPEND_FORMATS
+
+        if settings.format not in APPEND_FORMATS:
+            msg = (
+                f"Format '{settings.format}' can not be appended, only {', '.join(APPEND_FORMATS)} "
+                f"keep the runs dropped from memory (file: {settings.path})."
+            )
+            raise UserWarning(msg)
+
+    def aggregates(self) -> dict[str, dict[str, STORE_TYPES]]:
+        """Count, mean, std, min, max and approximate quantiles per name over all runs, with 'set_keep_runs' only."""
+        if self._retention is None or self.store is None:
+            return {}
+        self.flush()
+        return self._retention.summary(self.store)
+
+    def load(self, path: Union[str, Path], format: Optional[str] = None):
+        """Load the runs of a saved Arrow IPC file into the active store, the next runs continue after it."""
+        if self.store is None:
+            return
+        last_run = self.store.load(path, format)
+        if last_run is not None:
+            self._run_offset = max(self._run_offset, last_run + 1)
+
+    def checkpoint(self):
+        """Write the values changed since the last checkpoint."""
+        if self._checkpoint is not None:
+            self._checkpoint.write()
+
     def get(
         self, name: Optional[str] = None, default: STORE_TYPES = None, prefix: str = "default"
     ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
         if self.store is not None:
             name = self._get_name_with_prefix(name, prefix)
+            if self._thread_safe:
+                return self._get_in_context(name, default)
             return self.store.get(name=name, default=default)
-        return None
+        return default
+
+    def _get_in_context(self, name: Optional[str], default: STORE_TYPES) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
+        self.flush()
+        run = self._context_run()
+        with self._lock:
+            store = self.store
+            assert store is not None
+            idx = store._idx
+            if run is None or run == idx:
+                return store.get(name=name, default=default)
+            store.set_index(run)
+            try:
+                return store.get(name=name, default=default)
+            finally:
+                store.set_index(idx)  # type: ignore[arg-type]
 
     def save_to(
         self,
@@ -109,8 +374,18 @@ class Store:
         options: dict[str, Any] = {},
         force: bool = False,
         all_stores: bool = True,
+        append: bool = False,
     ):
+        """Save to this file at the end, with 'append' only new runs are added to an existing file
+        and the runs continue after the last stored run."""
         obj = self._save_to_obj(_path_or_obj, format=format, name=name, options=options)
+        from .dataset import DATASET_FORMATS
+
+        if obj.format in DATASET_FORMATS:
+            self._add_dataset(obj)
+            return
+        if self._retention is not None:
+            self._check_appendable(obj)
         if all_stores:
             for store_name, store in self.__stores__.items():
                 if name is None:
@@ -120,7 +395,15 @@ class Store:
                 store.save_to(obj)
         elif self.store is not None:
             self.store.save_to(obj)
-        self._prepare_existing_file(obj.path, force=force)
+        if append:
+            obj.append = True
+            if self.store is not None:
+                last_run = self.store._last_run(obj)
+                if last_run is not None:
+                    self._run_offset = max(self._run_offset, last_run + 1)
+            obj.append_from = self._run_offset
+        else:
+            self._prepare_existing_file(obj.path, force=force)
 
     def save(
         self,
@@ -135,9 +418,45 @@ class Store:
             obj = self._save_to_obj(_path_or_obj, format=format, name=name, options=options)
             self._prepare_existing_file(obj.path, force=force)
         if self.store is not None:
-            self.store.save(obj)  # path, format, **options)
+            self.flush()
+            try:
+                self.store.save(obj)  # path, format, **options)
+            finally:
+                if obj is None:
+                    self._close_datasets()
+
+    def _add_dataset(self, obj: SaveSettings):
+        """Values are written to the dataset while the tests run, the values already stored are added first."""
+        from .dataset import DatasetWriter
+
+        dataset = DatasetWriter(obj.path, **obj.options)
+        if self.store is not None:
+            for run, values in self.store.rows():
+                for name, value in values.items():
+                    dataset.record(run, name, value)
+        self._datasets.append(dataset)
+        self._recorders.append(dataset)
+
+    def _close_datasets(self):
+        # runs which could not be appended when they were dropped from memory
+        results = list(self._retention.errors) if self._retention is not None else []
+        for dataset in self._datasets:
+            result = SaveResult(SaveSettings(path=dataset.path, name=self._active_store, format="dataset"))
+            start = time.perf_counter()
+            try:
+                dataset.close()
+            except Exception as e:
+                result.error = e
+            result.duration = time.perf_counter() - start
+            results.append(result)
+        if self.store is not None:
+            self.store._save_results.extend(results)
+        failed = [r for r in results if r.error is not None]
+        if failed:
+            raise SaveError(failed) from failed[0].error
 
     def to_string(self, max_lines: int = 40, max_width: int = 120):
+        self.flush()
         if self.store is not None and hasattr(self.store, "to_string"):
             return self.store.to_string(max_lines=max_lines, max_width=max_width)
         else:
@@ -146,17 +465,43 @@ class Store:
                 print(self.data)
             out_lines = f.getvalue().split("\n")
             if len(out_lines) > max_lines:
-                out_lines = out_lines[: max_lines / 2] + out_lines[-max_lines / 2 :]
+                half = max_lines // 2
+                out_lines = out_lines[:half] + out_lines[-half:]
             return "\n".join(out_lines)
 
     def _get_name_with_prefix(self, name, prefix):
+        if name is None:  # all values of the run
+            return name
+        prefix = self._resolve_prefix(prefix)
+        if not prefix:
+            return name
+        names = self._names.get(prefix)
+        if names is None:
+            names = self._names[prefix] = {}
+        full_name = names.get(name)
+        if full_name is None:
+            # interned, the stores look up the same string object for every run
+            full_name = names[name] = sys.intern(f"{prefix}.{name}")
+        return full_name
+
+    def _resolve_prefix(self, prefix: str) -> str:
         if prefix == "default":
-            prefix = self._default_prefix
-            if self.item is None:
-                prefix = "PRE"
-        if prefix:
-            name = f"{prefix.format(item=self.item)}.{name}"
-        return name
+            item = self.item
+            if item is None:
+                return "PRE"
+            cached: Optional[tuple[str, str]] = getattr(item, item_prefix_attr, None)
+            if cached is not None and cached[0] is self._default_prefix:
+                return cached[1]
+            return self.intern_prefix(item)
+        if prefix and "{" in prefix:
+            return prefix.format(item=self.item)
+        return prefix
+
+    def intern_prefix(self, item: pytest.Item) -> str:
+        """Resolve the default prefix of 'item' once (called at collection), the result is kept on the item."""
+        prefix = sys.intern(self._default_prefix.format(item=item))
+        setattr(item, item_prefix_attr, (self._default_prefix, prefix))
+        return prefix
 
     def _save_to_obj(
         self,
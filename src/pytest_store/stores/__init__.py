@@ -1,33 +1,49 @@
 from __future__ import annotations
-from typing import Callable, Optional
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Callable, Iterator, Mapping, Optional, Union
 from ._store_base import StoreBase
 
-Stores: dict[str, Optional[Callable[[], StoreBase]]] = {}
-try:
-    import polars as pl
-    from .polars_df import PolarsDF
 
-    Stores["polars"] = PolarsDF
-    Stores["pl"] = PolarsDF
-    Stores["default"] = PolarsDF
-except ModuleNotFoundError:
-    pass
+class StoreRegistry(Mapping[str, Optional[Callable[[], StoreBase]]]):
+    """Store types by name, a store module is only imported when the store is looked up."""
 
+    def __init__(self):
+        self._paths: dict[str, Optional[str]] = {}
+        self._loaded: dict[str, Optional[Callable[[], StoreBase]]] = {}
 
-try:
-    import pandas as pd
-    from .pandas_df import PandasDF
+    def register(self, names: Union[str, list[str]], path: Optional[str], requires: tuple[str, ...] = ()) -> bool:
+        """Register 'path' ('module:Class', relative to this package) under 'names' if all 'requires' are installed.
+        The first registered store is also used as 'default'."""
+        if any(find_spec(module) is None for module in requires):
+            return False
+        for name in [names] if isinstance(names, str) else names:
+            self._paths[name] = path
+        if path is not None:
+            self._paths.setdefault("default", path)
+        return True
 
-    Stores["pandas"] = PandasDF
-    Stores["pd"] = PandasDF
-    if "default" not in Stores:
-        Stores["default"] = PandasDF
-except ModuleNotFoundError:
-    pass
+    def __getitem__(self, name: str) -> Optional[Callable[[], StoreBase]]:
+        if name not in self._loaded:
+            path = self._paths[name]
+            if path is None:
+                self._loaded[name] = None
+            else:
+                module, _, attr = path.partition(":")
+                self._loaded[name] = getattr(import_module(module, __name__), attr)
+        return self._loaded[name]
 
-from .list_dict import ListDict
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
 
-Stores["list-dict"] = ListDict
-if "default" not in Stores:
-    Stores["default"] = ListDict
-Stores["none"] = None
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+Stores = StoreRegistry()
+Stores.register(["polars", "pl"], ".polars_df:PolarsDF", requires=("polars",))
+Stores.register(["pandas", "pd"], ".pandas_df:PandasDF", requires=("pandas", "numpy"))
+Stores.register("list-dict", ".list_dict:ListDict")
+Stores.register("sqlite-stream", ".sqlite_stream:SqliteStream")
+Stores.register(["long", "tidy"], ".long_table:LongTable")
+Stores.register("none", None)
@@ -0,0 +1,223 @@
+"""Append new runs to an existing results file, only the new rows are written.
+
+- parquet: the path is a directory with one 'part-<first run>.parquet' file per save, an existing single file
+  is moved into it; all parts have the same schema, the earlier parts are rewritten once if columns are added
+- sqlite: rows are inserted, missing columns are added
+- jsonl: one JSON object per run
+- arrows: Arrow IPC stream, the record batches are added before the end of stream marker
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+from typing import Iterable, Optional
+
+from pytest_store.types import STORE_TYPES
+
+PARQUET_FORMATS = ("parquet",)
+SQLITE_FORMATS = ("sqlite", "sql", "db")
+JSONL_FORMATS = ("jsonl", "ndjson")
+IPC_STREAM_FORMATS = ("arrows",)
+APPEND_FORMATS = PARQUET_FORMATS + SQLITE_FORMATS + JSONL_FORMATS + IPC_STREAM_FORMATS
+# formats which are always written with the append writers
+STREAM_FORMATS = JSONL_FORMATS + IPC_STREAM_FORMATS
+
+_IPC_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+ROWS = Iterable[tuple[int, dict[str, STORE_TYPES]]]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def last_run(path: Path, format: str, name: str = "store") -> Optional[int]:
+    """Last 'RUN' of an existing file, read from metadata or the end of the file where possible."""
+    if not path.exists():
+        return None
+    if format in PARQUET_FORMATS:
+        return _parquet_last_run(path)
+    if format in SQLITE_FORMATS:
+        con = sqlite3.connect(path)
+        try:
+            run: Optional[int] = con.execute(f"SELECT MAX(RUN) FROM {_quote(name)}").fetchone()[0]
+            return run
+        except sqlite3.OperationalError:  # no table
+            return None
+        finally:
+            con.close()
+    if format in JSONL_FORMATS:
+        return _jsonl_last_run(path)
+    if format in IPC_STREAM_FORMATS:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        with pa.memory_map(str(path)) as source:
+            runs = [batch.column("RUN") for batch in pa.ipc.open_stream(source)]
+        return max((pc.max(r).as_py() for r in runs if len(r)), default=None)
+    raise UserWarning(f"Format '{format}' can not be appended, use {', '.join(APPEND_FORMATS)}.")
+
+
+def _parquet_last_run(path: Path) -> Optional[int]:
+    import pyarrow.parquet as pq
+
+    last = None
+    for part in [path] if path.is_file() else sorted(path.glob("*.parquet")):
+        metadata = pq.read_metadata(part)
+        column = metadata.schema.to_arrow_schema().get_field_index("RUN")
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(column).statistics
+            if stats is not None and stats.has_min_max:
+                last = stats.max if last is None else max(last, stats.max)
+    return last
+
+
+def _jsonl_last_run(path: Path) -> Optional[int]:
+    import msgspec
+
+    with open(path, "rb") as file:
+        file.seek(0, 2)
+        end = file.tell()
+        size = 4096
+        while True:
+            start = max(0, end - size)
+            file.seek(start)
+            lines = file.read(end - start).rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or start == 0:
+                break
+            size *= 2
+    if not lines[-1]:
+        return None
+    run: Optional[int] = msgspec.json.decode(lines[-1]).get("RUN")
+    return run
+
+
+def append_rows(path: Path, format: str, rows: ROWS, name: str = "store"):
+    """Append 'rows' ('(run, values)') to 'path', the file is created if it does not exist."""
+    rows = list(rows)
+    if format in PARQUET_FORMATS:
+        _append_parquet(path, rows)
+    elif format in SQLITE_FORMATS:
+        _append_sqlite(path, rows, name)
+    elif format in JSONL_FORMATS:
+        _append_jsonl(path, rows)
+    elif format in IPC_STREAM_FORMATS:
+        _append_ipc_stream(path, rows)
+    else:
+        raise UserWarning(f"Format '{format}' can not be appended (file: {path}), use {', '.join(APPEND_FORMATS)}.")
+
+
+def _table(rows: ROWS, schema=None):
+    import pyarrow as pa
+
+    return pa.Table.from_pylist([{"RUN": run, **values} for run, values in rows], schema=schema)
+
+
+def _append_parquet(path: Path, rows: ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not rows:
+        return
+    if path.is_file():
+        # move the single file into a dataset directory, no data is rewritten
+        tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+        path.rename(tmp / "part-0.parquet")
+        tmp.rename(path)
+    path.mkdir(parents=True, exist_ok=True)
+    table = _table(rows)
+    part = next(path.glob("*.parquet"), None)
+    if part is not None:
+        schema = pq.read_schema(part)
+        unified = pa.unify_schemas([schema, table.schema], promote_options="permissive")
+        if not unified.equals(schema):
+            # readers take the schema of one part, the earlier parts get the new columns as nulls
+            for part in path.glob("*.parquet"):
+                tmp = part.with_name(f".{part.name}.tmp")
+                pq.write_table(conform_table(pq.read_table(part), unified), tmp)
+                os.replace(tmp, part)
+        table = conform_table(table, unified)
+    first = min(run for run, _ in rows)
+    pq.write_table(table, path / f"part-{first}.parquet")
+
+
+def conform_table(table, schema):
+    """'table' with the columns of 'schema' in its order, missing columns are null."""
+    import pyarrow as pa
+
+    names = set(table.column_names)
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in names else pa.nulls(len(table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _append_sqlite(path: Path, rows: ROWS, name: str):
+    import msgspec
+
+    con = sqlite3.connect(path, isolation_level=None)
+    table = _quote(name)
+    try:
+        con.execute("BEGIN")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {table} (RUN INTEGER PRIMARY KEY)")
+        columns = {column[1] for column in con.execute(f"PRAGMA table_info({table})")}
+        for _run, values in rows:
+            for column in values:
+                if column not in columns:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)}")
+                    columns.add(column)
+        statements: dict[tuple[str, ...], list[tuple]] = {}
+        for run, values in rows:
+            params = [run] + [
+                msgspec.json.encode(v).decode("utf-8") if isinstance(v, (list, dict)) else v for v in values.values()
+            ]
+            statements.setdefault(tuple(values), []).append(tuple(params))
+        for names, batch in statements.items():
+            sql_columns = ", ".join(["RUN", *(_quote(n) for n in names)])
+            placeholders = ", ".join("?" * (len(names) + 1))
+            con.executemany(f"INSERT INTO {table} ({sql_columns}) VALUES ({placeholders})", batch)
+        con.execute("COMMIT")
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def _append_jsonl(path: Path, rows: ROWS):
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    with open(path, "ab") as file:
+        for run, values in rows:
+            file.write(encoder.encode({"RUN": run, **values}) + b"\n")
+
+
+def _append_ipc_stream(path: Path, rows: ROWS):
+    import pyarrow as pa
+
+    if not path.exists() or path.stat().st_size == 0:
+        table = _table(rows)
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return
+    if not rows:
+        return
+    with pa.OSFile(str(path)) as source:
+        schema = pa.ipc.open_stream(source).schema
+    new_columns = {column for _, values in rows for column in values} - set(schema.names)
+    if new_columns:
+        raise UserWarning(f"Columns {', '.join(sorted(new_columns))} are not in the Arrow IPC stream '{path}'.")
+    table = _table(rows, schema=schema)
+    with open(path, "r+b") as file:
+        file.seek(-len(_IPC_EOS), 2)
+        if file.read(len(_IPC_EOS)) == _IPC_EOS:
+            file.seek(-len(_IPC_EOS), 2)
+        for batch in table.to_batches():
+            file.write(batch.serialize().to_pybytes())
+        file.write(_IPC_EOS)
+        file.truncate()
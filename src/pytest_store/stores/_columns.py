@@ -0,0 +1,190 @@
+"""Typed column storage, numeric columns are kept in `array` buffers with a separate validity mask."""
+from __future__ import annotations
+
+from array import array
+from itertools import repeat
+from typing import AbstractSet, Any, Iterator, Optional
+
+from pytest_store.types import STORE_TYPES
+
+# kind -> array typecode, kinds without typecode are kept in a list
+TYPECODES = {"bool": "b", "int": "q", "float": "d"}
+NUMERIC = ("int", "float")
+KIND_BY_TYPE = {bool: "bool", int: "int", float: "float", str: "str"}
+
+
+def value_kind(value: Any) -> str:
+    kind = KIND_BY_TYPE.get(type(value))
+    if kind is not None:
+        return kind
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "object"
+
+
+def promote(kind: Optional[str], other: str) -> str:
+    """Smallest kind which holds values of 'kind' and 'other'."""
+    if kind is None or kind == other:
+        return other
+    if kind in NUMERIC and other in NUMERIC:
+        return "float"
+    return "object"
+
+
+class Column:
+    """Values of one column, the kind is taken from the first value and only promoted when needed
+    (int -> float -> object)."""
+
+    __slots__ = ("kind", "values", "valid")
+
+    def __init__(self):
+        self.kind: Optional[str] = None
+        self.values: Any = []
+        self.valid = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def _grow(self, size: int):
+        missing = size - len(self.valid)
+        if missing > 0:
+            self.valid.extend(bytes(missing))
+            self.values.extend(repeat(0 if isinstance(self.values, array) else None, missing))
+
+    def _promote(self, kind: str):
+        values = [v if ok else None for v, ok in zip(self.values, self.valid)]
+        if self.kind == "bool":
+            values = [bool(v) if v is not None else None for v in values]
+        self.kind = kind
+        if kind in TYPECODES:
+            self.values = array(TYPECODES[kind], (0 if v is None else v for v in values))
+        else:
+            self.values = values
+
+    def set(self, row: int, value: STORE_TYPES):
+        size = len(self.valid)
+        if value is None:
+            if row < size:
+                self.valid[row] = 0
+                if not isinstance(self.values, array):
+                    self.values[row] = None
+            return
+        kind = value_kind(value)
+        if kind != self.kind:
+            kind = promote(self.kind, kind)
+            if kind != self.kind:
+                self._promote(kind)
+        if row > size:
+            self._grow(row)
+            size = row
+        try:
+            if row == size:  # new row
+                self.values.append(value)
+                self.valid.append(1)
+            else:
+                self.values[row] = value
+                self.valid[row] = 1
+        except OverflowError:  # int larger than 64 bit
+            self._promote("object")
+            self.set(row, value)
+
+    def take(self, rows: list[int]):
+        """Keep only 'rows' (ascending)."""
+        rows = [row for row in rows if row < len(self.valid)]
+        if isinstance(self.values, array):
+            self.values = array(self.values.typecode, (self.values[row] for row in rows))
+        else:
+            self.values = [self.values[row] for row in rows]
+        self.valid = bytearray(self.valid[row] for row in rows)
+
+    def get(self, row: int) -> STORE_TYPES:
+        if row >= len(self.valid) or not self.valid[row]:
+            return None
+        value = self.values[row]
+        return bool(value) if self.kind == "bool" else value
+
+    def to_numpy(self, size: int):
+        """Return '(values, mask)' as numpy arrays with 'size' rows, 'mask' is True for missing values."""
+        import numpy as np
+
+        self._grow(size)
+        mask = np.frombuffer(bytes(self.valid[:size]), dtype=np.uint8) == 0
+        if self.kind in TYPECODES:
+            values = np.array(self.values[:size], dtype=TYPECODES[self.kind])
+            if self.kind == "bool":
+                values = values.astype(bool)
+        else:
+            values = np.empty(size, dtype=object)
+            values[:] = self.values[:size]
+        return values, mask
+
+
+class ColumnTable:
+    """Rows indexed by run, values stored per column."""
+
+    def __init__(self):
+        self.runs = array("q")  # row -> run
+        self.rows: dict[int, int] = {}  # run -> row
+        self.columns: dict[str, Column] = {}
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def row(self, run: int) -> int:
+        """Row of 'run', added if missing."""
+        row = self.rows.get(run)
+        if row is None:
+            row = self.rows[run] = len(self.runs)
+            self.runs.append(run)
+        return row
+
+    def set(self, row: int, name: str, value: STORE_TYPES):
+        column = self.columns.get(name)
+        if column is None:
+            if value is None:
+                return
+            column = self.columns[name] = Column()
+        column.set(row, value)
+
+    def set_many(self, row: int, values: dict[str, STORE_TYPES]):
+        columns = self.columns
+        for name, value in values.items():
+            column = columns.get(name)
+            if column is None:
+                if value is None:
+                    continue
+                column = columns[name] = Column()
+            column.set(row, value)
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        """Remove the rows of 'runs', columns without values are removed as well."""
+        keep = [row for row, run in enumerate(self.runs) if run not in runs]
+        self.runs = array("q", (self.runs[row] for row in keep))
+        self.rows = {run: row for row, run in enumerate(self.runs)}
+        for name, column in list(self.columns.items()):
+            column.take(keep)
+            if not any(column.valid):
+                del self.columns[name]
+
+    def get(self, row: int, name: str, default: STORE_TYPES = None) -> STORE_TYPES:
+        column = self.columns.get(name)
+        value = column.get(row) if column is not None else None
+        return default if value is None else value
+
+    def row_values(self, row: int) -> dict[str, STORE_TYPES]:
+        values: dict[str, STORE_TYPES] = {}
+        for name, column in self.columns.items():
+            value = column.get(row)
+            if value is not None:
+                values[name] = value
+        return values
+
+    def iter_rows(self) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        for row, run in enumerate(self.runs):
+            yield run, self.row_values(row)
@@ -1,34 +1,48 @@
 # Python program showing
 # abstract base class work
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
+from dataclasses import dataclass, field
 import io
+import itertools
+import os
 from pathlib import Path
-from typing import Any, Optional, Union
-
-import msgspec
+import time
+from typing import AbstractSet, Any, Callable, Iterable, Iterator, Optional, Union
 
 from pytest_store.types import STORE_TYPES, STORE_TYPES_SINGLE
+from pytest_store.stores._append import STREAM_FORMATS, append_rows, last_run
+
 
+# Arrow IPC file formats, these can be loaded again
+IPC_FORMATS = ("arrow", "ipc", "feather")
 
-class SaveSettings(msgspec.Struct):
+
+@dataclass
+class SaveSettings:
     """Settings used for saving data to ..."""
 
     path: Path
     name: str
     format: str
-    options: dict[str, Any] = {}
+    options: dict[str, Any] = field(default_factory=dict)
+    append: bool = False  # append the runs from 'append_from' on to an existing file
+    append_from: int = 0
 
     def default_options(self, options: dict[str, Any] = {}):
         options.update(self.options)  # type: ignore
         self.options = options
 
 
-class SaveExtras(msgspec.Struct):
+@dataclass
+class SaveExtras:
     """Returned values from the save object"""
 
-    settings: list[SaveSettings] = []
-    extras_by_format: dict[str, Any] = {}
+    settings: list[SaveSettings] = field(default_factory=list)
+    extras_by_format: dict[str, Any] = field(default_factory=dict)
 
     def get_extras(self, format):
         return self.extras_by_format.get(format, {})
@@ -37,11 +51,83 @@ class SaveExtras(msgspec.Struct):
         self.extras_by_format[format] = values
 
 
+@dataclass
+class SaveResult:
+    """Duration in seconds or the error of saving one file."""
+
+    settings: SaveSettings
+    duration: float = 0.0
+    error: Optional[BaseException] = None
+
+
+class SaveError(UserWarning):
+    """Raised after all files are written if at least one failed."""
+
+    def __init__(self, results: list[SaveResult]):
+        self.results = results
+        super().__init__(", ".join(f"'{r.settings.path}': {r.error}" for r in results))
+
+
+def max_columns(max_width: int = 0, default: int = 8) -> int:
+    """Number of columns shown in 'max_width' characters."""
+    return max(2, max_width // 15) if max_width else default
+
+
+def head_tail_yaml(
+    head: Iterable[Any], tail: Iterable[Any], total: int, max_lines: int = 40, max_width: int = 0
+) -> str:
+    """YAML list of the first and last of 'total' rows with at most 'max_lines' lines.
+
+    'head' yields the rows from the start, 'tail' from the end. Only the rows shown are encoded,
+    with the first names of each row if it does not fit, lines are cut at 'max_width'.
+    """
+    import msgspec
+
+    half = max(1, max_lines // 2)
+    names = max(1, half - 1)
+
+    def encode(row) -> list[str]:
+        if isinstance(row, dict) and len(row) > names:
+            row = dict(itertools.islice(row.items(), names))
+            return msgspec.yaml.encode([row]).decode("utf-8").rstrip("\n").split("\n") + ["  ..."]
+        return msgspec.yaml.encode([row]).decode("utf-8").rstrip("\n").split("\n")
+
+    lines: list[str] = []
+    starts: list[int] = []  # first line of each row
+    for row in head:
+        starts.append(len(lines))
+        lines.extend(encode(row))
+        if len(lines) > max_lines:
+            break
+    if len(lines) <= max_lines and len(starts) == total:
+        out_lines = lines
+    else:
+        # whole rows only, a row longer than 'half' lines is cut at the end
+        ends = starts[1:] + [len(lines)]
+        in_head = max(1, sum(1 for end in ends if end <= half))
+        head_lines = lines[: ends[in_head - 1]][:half]
+        tail_rows: list[list[str]] = []
+        tail_count = 0
+        for row in itertools.islice(tail, max(0, total - in_head)):
+            row_lines = encode(row)[:half]
+            if tail_rows and tail_count + len(row_lines) > half:
+                break
+            tail_rows.insert(0, row_lines)
+            tail_count += len(row_lines)
+        tail_lines = [line for row_lines in tail_rows for line in row_lines]
+        out_lines = head_lines + ["\n" + " " * 8 + "..." + "\n"] + tail_lines
+    if max_width:
+        out_lines = [line if len(line) <= max_width else line[: max_width - 3] + "..." for line in out_lines]
+    return "\n".join(out_lines)
+
+
 class StoreBase(ABC):
     def __init__(self):
         self._data = []
         self._idx = None
         self._save_settings_list: list[SaveSettings] = []
+        self._append_buffers: dict[tuple[int, str], list[STORE_TYPES_SINGLE]] = {}
+        self._save_results: list[SaveResult] = []
 
     @property
     def data(self):
@@ -55,24 +141,165 @@ class StoreBase(ABC):
     def set(self, name: str, value: STORE_TYPES) -> STORE_TYPES:
         pass
 
+    def set_many(self, values: dict[str, STORE_TYPES]) -> dict[str, STORE_TYPES]:
+        """Set several values of the current run, stores override this to apply them at once."""
+        for name, value in values.items():
+            self.set(name, value)
+        return values
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES]) -> None:
+        """Set 'name' for several runs ('run -> value'), the current index is kept.
+
+        Stores override this to assign the whole column at once.
+        """
+        self.merge_rows((run, {name: value}) for run, value in values.items())
+
+    @abstractmethod
+    def drop_runs(self, runs: AbstractSet[int]) -> None:
+        """Remove 'runs' from memory, see '--store-keep-runs'."""
+        pass
+
+    def _drop_run_buffers(self, runs: AbstractSet[int]) -> None:
+        if self._append_buffers:
+            for key in [key for key in self._append_buffers if key[0] in runs]:
+                del self._append_buffers[key]
+
+    def _drop_other_run_buffers(self) -> None:
+        """Keep only the buffers of the current run, for stores which hold a copy of the appended values."""
+        if self._append_buffers:
+            idx = self._idx
+            for key in [key for key in self._append_buffers if key[0] != idx]:
+                del self._append_buffers[key]
+
+    def _drop_append_buffers(self, names: Iterable[str]) -> None:
+        if self._append_buffers:
+            for name in names:
+                self._append_buffers.pop((self._idx, name), None)
+
     def get(
         self, name: Optional[str] = None, default: STORE_TYPES = None
     ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
         pass
 
     def append(self, name: str, value: Union[STORE_TYPES_SINGLE, list[STORE_TYPES_SINGLE]]) -> list[STORE_TYPES_SINGLE]:
-        current_val = self.get(name, [])
-        if not isinstance(value, list):
-            value = [value]
-        if not isinstance(current_val, list):
-            current_val = [current_val]
-        new_val: list[STORE_TYPES_SINGLE] = current_val + value
-        self.set(name, new_val)
-        return new_val
+        """Append to the list in the current run.
+
+        The list is kept as buffer which is extended in place, a 'set' with the same name drops it.
+        """
+        key = (self._idx, name)
+        buffer = self._append_buffers.get(key)
+        if buffer is None:
+            current_val = self.get(name, [])
+            buffer = list(current_val) if isinstance(current_val, list) else [current_val]
+            self.set(name, buffer)
+            self._append_buffers[key] = buffer
+        if isinstance(value, list):
+            buffer.extend(value)
+        else:
+            buffer.append(value)
+        self._appended(name, buffer)
+        return buffer
+
+    def _appended(self, name: str, buffer: list[STORE_TYPES_SINGLE]) -> None:
+        """Called after 'buffer' was extended, for stores which do not keep a reference to it."""
+        pass
+
+    def _drop_append_buffer(self, name: str) -> None:
+        if self._append_buffers:
+            self._append_buffers.pop((self._idx, name), None)
+
+    @abstractmethod
+    def rows(self) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        """Iterate over all runs as '(run, values)', values which are not set are left out."""
+        pass
+
+    def _select_rows(self, runs: AbstractSet[int]) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        """Only the 'runs' of 'rows()', stores which do not keep the runs in memory override this."""
+        return ((run, values) for run, values in self.rows() if run in runs)
+
+    def merge_rows(self, rows: Iterable[tuple[int, dict[str, STORE_TYPES]]]):
+        """Set the values of 'rows' (see 'rows()'), the current index is kept."""
+        idx = self._idx
+        for run, values in rows:
+            self.set_index(run)
+            for name, value in values.items():
+                self.set(name, value)
+        if idx is not None:
+            self.set_index(idx)
+
+    def load(self, path: Union[str, Path], format: Optional[str] = None) -> Optional[int]:
+        """Add the runs of a saved Arrow IPC file, returns the last loaded run.
+
+        The file is memory mapped, stores which can use the mapped data directly override this.
+        """
+        path = Path(path)
+        format = format or path.suffix[1:]
+        if format not in IPC_FORMATS:
+            raise UserWarning(f"Format '{format}' can not be loaded (file: {path}), use {', '.join(IPC_FORMATS)}.")
+        import pyarrow as pa
+
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if "RUN" not in table.column_names:
+            raise UserWarning(f"File '{path}' has no 'RUN' column.")
+        rows = []
+        for row in table.to_pylist():
+            run = row.pop("RUN")
+            rows.append((run, {name: value for name, value in row.items() if value is not None}))
+        self.merge_rows(rows)
+        return max((run for run, _ in rows), default=None)
 
     def save_to(self, __obj: SaveSettings):
         self._save_settings_list.append(__obj)
 
+    @property
+    def save_results(self) -> list[SaveResult]:
+        """Results of the last 'save()'."""
+        return self._save_results
+
+    def _save_all(self, settings: list[SaveSettings], write: Callable[[SaveSettings], Any]) -> list[SaveResult]:
+        """Call 'write' per file, several files are written at the same time on a thread pool.
+
+        A failing file does not stop the others, 'SaveError' is raised at the end.
+        """
+
+        def run(cfg: SaveSettings) -> SaveResult:
+            result = SaveResult(cfg)
+            start = time.perf_counter()
+            try:
+                if cfg.append or cfg.format in STREAM_FORMATS:
+                    self._append(cfg)
+                else:
+                    write(cfg)
+            except Exception as e:
+                result.error = e
+            result.duration = time.perf_counter() - start
+            return result
+
+        if len(settings) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(settings), os.cpu_count() or 1)) as pool:
+                results = list(pool.map(run, settings))
+        else:
+            results = [run(cfg) for cfg in settings]
+        self._save_results = results
+        failed = [r for r in results if r.error is not None]
+        if failed:
+            raise SaveError(failed) from failed[0].error
+        return results
+
+    def _append(self, cfg: SaveSettings, runs: Optional[AbstractSet[int]] = None):
+        """Append the runs from 'cfg.append_from' on, or only 'runs'."""
+        rows: Iterator[tuple[int, dict[str, STORE_TYPES]]]
+        if runs is None:
+            rows = ((run, values) for run, values in self.rows() if run >= cfg.append_from)
+        else:
+            rows = self._select_rows(runs)
+        append_rows(Path(cfg.path), cfg.format, rows, name=cfg.name)
+
+    def _last_run(self, cfg: SaveSettings) -> Optional[int]:
+        """Last run already stored in the file of 'cfg'."""
+        return last_run(Path(cfg.path), cfg.format, name=cfg.name)
+
     @abstractmethod
     def save(self, __save_settings: Union[None, SaveSettings] = None, _previous_return: Any = None) -> SaveExtras:
         # for save_settings in self._save_settings_list:
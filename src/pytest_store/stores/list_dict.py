@@ -1,34 +1,66 @@
 from __future__ import annotations
 
 import contextlib
+import heapq
 import io
 from pathlib import Path
-from typing import Optional, Union
+from typing import AbstractSet, Optional, Union
 import msgspec
 
 from pytest_store.types import STORE_TYPES
-from pytest_store.stores._store_base import StoreBase, SaveSettings, SaveExtras
+from pytest_store.stores._store_base import StoreBase, SaveSettings, SaveExtras, head_tail_yaml
 
 
 class ListDict(StoreBase):
+    """The runs are kept in a dict keyed by run, saved as list where the index is the run."""
+
     def __init__(self):
         super().__init__()
-        self._data = []
+        self._data: dict[int, dict[str, STORE_TYPES]] = {}
         self._idx = None
         self.set_index(0)
 
+    @property
+    def data(self) -> list[dict[str, STORE_TYPES]]:
+        if not self._data:
+            return []
+        return [self._data.get(run, {}) for run in range(max(self._data) + 1)]
+
     def set_index(self, idx: int):
         self._idx = idx
-        if idx >= len(self._data):
-            self._data.append({})
-            self.set_index(idx)
+        if idx not in self._data:
+            self._data[idx] = {}
 
     def set(self, name: str, value: STORE_TYPES):
+        self._drop_append_buffer(name)
         if self._idx is not None:
             self._data[self._idx][name] = value
             return value
         return None
 
+    def set_many(self, values: dict[str, STORE_TYPES]):
+        self._drop_append_buffers(values)
+        if self._idx is not None:
+            self._data[self._idx].update(values)
+            return values
+        return {}
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES]):
+        data = self._data
+        for run, value in values.items():
+            if self._append_buffers:
+                self._append_buffers.pop((run, name), None)
+            row = data.get(run)
+            if row is None:
+                row = data[run] = {}
+            row[name] = value
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        self._drop_run_buffers(runs)
+        for run in runs:
+            if run != self._idx:
+                self._data.pop(run, None)
+
     def get(
         self, name: Optional[str] = None, default: STORE_TYPES = None
     ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
@@ -43,28 +75,39 @@ class ListDict(StoreBase):
             val = None
         return val
 
+    def rows(self):
+        for run, values in sorted(self._data.items()):
+            if values:
+                yield run, values
+
     def save(self, __save_settings: Union[None, SaveSettings] = None, __extras: Union[None, SaveExtras] = None):
         """See https://jcristharif.com/msgspec/usage.html"""
         settings = self._save_settings_list if __save_settings is None else [__save_settings]
         extras = __extras if __extras else SaveExtras()
         extras.settings = settings
-        for cfg in settings:
+
+        def write(cfg: SaveSettings):
             if cfg.format == "yml":
                 cfg.format = "yaml"
             if hasattr(msgspec, cfg.format) and hasattr(getattr(msgspec, cfg.format), "encode"):
                 enc_cmd = getattr(getattr(msgspec, cfg.format), "encode")
-                stream = enc_cmd(self._data)
+                stream = enc_cmd(self.data)
                 with open(cfg.path, "wb") as file:
                     file.write(stream)
+            else:
+                msg = f"Format '{cfg.format}' not supported by msgspec (file: {cfg.path})."
+                raise UserWarning(msg)
+
+        self._save_all(settings, write)
         return extras
 
     def to_string(self, max_lines=40, max_width=0):
-        values = msgspec.yaml.encode(self._data).decode("utf-8")
-        out_lines = values.split("\n")
-        if len(out_lines) > max_lines:
-            idx = int(max_lines / 2)
-            out_lines = out_lines[0:idx] + ["\n" + " " * 8 + "..." + "\n"] + out_lines[-idx:]
-        return "\n".join(out_lines)
+        data = self._data
+        runs = [run for run, values in data.items() if values]
+        # each row has at least one line, no more rows are shown
+        head = ({"RUN": run, **data[run]} for run in heapq.nsmallest(max_lines + 1, runs))
+        tail = ({"RUN": run, **data[run]} for run in heapq.nlargest(max_lines + 1, runs))
+        return head_tail_yaml(head, tail, len(runs), max_lines, max_width)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+from array import array
+import itertools
+from pathlib import Path
+import sqlite3
+from typing import AbstractSet, Any, Iterator, Optional, Union
+
+import msgspec
+
+from pytest_store.types import STORE_TYPES
+from pytest_store.stores._append import JSONL_FORMATS, SQLITE_FORMATS, append_rows
+from pytest_store.stores._columns import value_kind
+from pytest_store.stores._store_base import IPC_FORMATS, StoreBase, SaveSettings, SaveExtras
+
+COLUMNS = ("RUN", "test", "key", "type", "value", "number")
+ARROW_FORMATS = ("parquet", "csv") + IPC_FORMATS
+
+
+class LongTable(StoreBase):
+    """Store in long (tidy) layout, one row per value instead of one column per name.
+
+    A name 'test.key' is split into 'test' and 'key' (names without prefix have an empty test).
+    The saved table has the columns 'RUN', 'test', 'key', 'type' (bool, int, float, str, list, dict),
+    'value' (strings as is, other types JSON encoded) and 'number' (numeric values as float).
+    Memory and save time only depend on the values set, use `pivot()` for the wide layout.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._runs = array("q")
+        self._tests = array("l")
+        self._keys = array("l")
+        self._values: list[STORE_TYPES] = []
+        self._index: dict[tuple[int, int, int], int] = {}  # (run, test, key) -> row
+        self._test_names: list[str] = []
+        self._key_names: list[str] = []
+        self._test_ids: dict[str, int] = {}
+        self._key_ids: dict[str, int] = {}
+        self._names: dict[str, tuple[int, int]] = {}  # name -> (test, key)
+        self.set_index(0)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _ids(self, name: str) -> tuple[int, int]:
+        ids = self._names.get(name)
+        if ids is None:
+            test, _, key = name.rpartition(".")
+            test_id = self._test_ids.get(test)
+            if test_id is None:
+                test_id = self._test_ids[test] = len(self._test_names)
+                self._test_names.append(test)
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = self._key_ids[key] = len(self._key_names)
+                self._key_names.append(key)
+            ids = self._names[name] = (test_id, key_id)
+        return ids
+
+    def _name(self, row: int) -> str:
+        test = self._test_names[self._tests[row]]
+        key = self._key_names[self._keys[row]]
+        return f"{test}.{key}" if test else key
+
+    def set_index(self, idx: int):
+        self._idx = idx
+
+    def set(self, name: str, value: STORE_TYPES):
+        self._drop_append_buffer(name)
+        test_id, key_id = self._ids(name)
+        index_key = (self._idx, test_id, key_id)
+        row = self._index.get(index_key)
+        if row is not None:
+            self._values[row] = value
+        elif value is not None:
+            self._index[index_key] = len(self._values)
+            self._runs.append(self._idx)  # type: ignore[arg-type]
+            self._tests.append(test_id)
+            self._keys.append(key_id)
+            self._values.append(value)
+        return value
+
+    def set_many(self, values: dict[str, STORE_TYPES]):
+        self._drop_append_buffers(values)
+        run, index, ids = self._idx, self._index, self._ids
+        for name, value in values.items():
+            test_id, key_id = ids(name)
+            index_key = (run, test_id, key_id)
+            row = index.get(index_key)
+            if row is not None:
+                self._values[row] = value
+            elif value is not None:
+                index[index_key] = len(self._values)
+                self._runs.append(run)  # type: ignore[arg-type]
+                self._tests.append(test_id)
+                self._keys.append(key_id)
+                self._values.append(value)
+        return values
+
+    def get(
+        self, name: Optional[str] = None, default: STORE_TYPES = None
+    ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
+        if name is None:
+            return {self._name(row): value for row, value in self._run_rows(self._idx)}  # type: ignore[arg-type]
+        row = self._index.get((self._idx, *self._ids(name)))  # type: ignore[arg-type]
+        value = self._values[row] if row is not None else None
+        return default if value is None else value
+
+    def _run_rows(self, run: int) -> Iterator[tuple[int, STORE_TYPES]]:
+        for row, row_run in enumerate(self._runs):
+            if row_run == run and self._values[row] is not None:
+                yield row, self._values[row]
+
+    def rows(self) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        runs: dict[int, dict[str, STORE_TYPES]] = {}
+        for row, value in enumerate(self._values):
+            if value is not None:
+                runs.setdefault(self._runs[row], {})[self._name(row)] = value
+        for run in sorted(runs):
+            yield run, runs[run]
+
+    def pivot(self, frame: Optional[str] = None) -> Any:
+        """Wide layout, one row per run and one column per name.
+
+        Returned as list of dicts, or as data frame with 'frame' set to 'polars' or 'pandas'.
+        """
+        rows = [{"RUN": run, **values} for run, values in self.rows()]
+        if frame == "polars":
+            import polars as pl
+
+            return pl.DataFrame(rows, infer_schema_length=None)
+        if frame == "pandas":
+            import pandas as pd
+
+            return pd.DataFrame(rows)
+        return rows
+
+    def _row(self, row: int) -> tuple:
+        """Values of 'row' in the order of 'COLUMNS'."""
+        value = self._values[row]
+        kind = value_kind(value)
+        if kind == "object":
+            kind = "list" if isinstance(value, list) else "dict" if isinstance(value, dict) else kind
+        return (
+            self._runs[row],
+            self._test_names[self._tests[row]],
+            self._key_names[self._keys[row]],
+            kind,
+            value if kind == "str" else msgspec.json.encode(value).decode("utf-8"),
+            float(value) if kind in ("bool", "int", "float") else None,  # type: ignore[arg-type]
+        )
+
+    def columns(self) -> dict[str, list]:
+        """The long table as columns, see 'COLUMNS'."""
+        rows = [self._row(row) for row, value in enumerate(self._values) if value is not None]
+        if not rows:
+            return {name: [] for name in COLUMNS}
+        return {name: list(values) for name, values in zip(COLUMNS, zip(*rows))}
+
+    @property
+    def data(self) -> list[dict[str, STORE_TYPES]]:
+        columns = self.columns()
+        return [dict(zip(COLUMNS, values)) for values in zip(*columns.values())]
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        self._drop_run_buffers(runs)
+        keep = [row for row, run in enumerate(self._runs) if run not in runs]
+        self._runs = array("q", (self._runs[row] for row in keep))
+        self._tests = array("l", (self._tests[row] for row in keep))
+        self._keys = array("l", (self._keys[row] for row in keep))
+        self._values = [self._values[row] for row in keep]
+        self._index = {key: row for row, key in enumerate(zip(self._runs, self._tests, self._keys))}
+
+    def _long_rows(
+        self, append_from: int = 0, runs: Optional[AbstractSet[int]] = None
+    ) -> Iterator[tuple[int, dict[str, STORE_TYPES]]]:
+        for values in self.data:
+            run = values["RUN"]
+            if run >= append_from if runs is None else run in runs:  # type: ignore[operator]
+                values.pop("RUN")
+                yield run, values  # type: ignore[misc]
+
+    def _append(self, cfg: SaveSettings, runs: Optional[AbstractSet[int]] = None):
+        if cfg.format in SQLITE_FORMATS:
+            append_from = cfg.append_from if cfg.append or runs is not None else None
+            self._save_sqlite(Path(cfg.path), cfg.name, append_from=append_from, runs=runs)
+        else:
+            append_rows(Path(cfg.path), cfg.format, self._long_rows(cfg.append_from, runs), name=cfg.name)
+
+    def _arrow_table(self):
+        import pyarrow as pa
+
+        schema = pa.schema(
+            [
+                ("RUN", pa.int64()),
+                ("test", pa.string()),
+                ("key", pa.string()),
+                ("type", pa.string()),
+                ("value", pa.string()),
+                ("number", pa.float64()),
+            ]
+        )
+        return pa.table(self.columns(), schema=schema)
+
+    def _save_sqlite(
+        self, path: Path, name: str, append_from: Optional[int] = None, runs: Optional[AbstractSet[int]] = None
+    ):
+        """Write the long table, with 'append_from' the rows from this run on (or of 'runs')
+        are added to an existing table."""
+        columns = self.columns()
+        params = zip(*columns.values())
+        if runs is not None:
+            params = (p for p in params if p[0] in runs)  # type: ignore[assignment]
+        elif append_from is not None:
+            params = (p for p in params if p[0] >= append_from)  # type: ignore[assignment]
+        table = '"' + name.replace('"', '""') + '"'
+        con = sqlite3.connect(path, isolation_level=None)
+        try:
+            con.execute("BEGIN")
+            if append_from is None:
+                con.execute(f"DROP TABLE IF EXISTS {table}")
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(RUN INTEGER, test TEXT, key TEXT, type TEXT, value TEXT, number REAL)"
+            )
+            con.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?)", params)
+            con.execute("COMMIT")
+        except BaseException:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def save(self, __save_settings: Union[None, SaveSettings] = None, __extras: Union[None, SaveExtras] = None):
+        """Parquet, csv and Arrow IPC with pyarrow, sqlite with sqlite3, xlsx with xlsxwriter
+        and the msgspec formats (json, yaml, msgpack, toml)."""
+        settings = self._save_settings_list if __save_settings is None else [__save_settings]
+        extras = __extras if __extras else SaveExtras()
+        extras.settings = settings
+
+        def write(cfg: SaveSettings):
+            if cfg.format == "yml":
+                cfg.format = "yaml"
+            if cfg.format in ARROW_FORMATS:
+                import pyarrow.csv
+                import pyarrow.feather
+                import pyarrow.parquet
+
+                table = self._arrow_table()
+                if cfg.format == "parquet":
+                    pyarrow.parquet.write_table(table, cfg.path, **cfg.options)
+                elif cfg.format == "csv":
+                    pyarrow.csv.write_csv(table, cfg.path, **cfg.options)
+                else:
+                    pyarrow.feather.write_feather(table, str(cfg.path), **cfg.options)
+            elif cfg.format in SQLITE_FORMATS:
+                self._save_sqlite(Path(cfg.path), cfg.name)
+            elif cfg.format in ("xls", "xlsx"):
+                self._save_excel(Path(cfg.path), cfg.name)
+            elif cfg.format not in JSONL_FORMATS and hasattr(getattr(msgspec, cfg.format, None), "encode"):
+                with open(cfg.path, "wb") as file:
+                    file.write(getattr(msgspec, cfg.format).encode(self.data))
+            else:
+                msg = f"Format '{cfg.format}' not supported by the long store (file: {cfg.path})."
+                raise UserWarning(msg)
+
+        self._save_all(settings, write)
+        return extras
+
+    def _save_excel(self, path: Path, name: str):
+        import xlsxwriter
+
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        try:
+            worksheet = workbook.add_worksheet(name[:31])
+            worksheet.write_row(0, 0, COLUMNS)
+            for i, values in enumerate(zip(*self.columns().values()), start=1):
+                worksheet.write_row(i, 0, values)
+            worksheet.freeze_panes(1, 0)
+        finally:
+            workbook.close()
+
+    def to_string(self, max_lines=40, max_width=0):
+        """Only the first and last rows are formatted."""
+        from tabulate import tabulate
+
+        width = max(max_width // 3, 20) if max_width else 40
+        values = self._values
+        set_rows = (row for row in range(len(values)) if values[row] is not None)
+        rows = list(itertools.islice(set_rows, max_lines + 1))
+        if len(rows) > max_lines:
+            half = max_lines // 2
+            tail = itertools.islice((row for row in range(len(values) - 1, rows[half], -1) if values[row] is not None), half)
+            rows = rows[:half] + [-1] + sorted(tail)
+        lines = []
+        for row in rows:
+            if row < 0:
+                lines.append(("...",) * len(COLUMNS))
+                continue
+            run, test, key, kind, value, number = self._row(row)
+            lines.append((run, test, key, kind, value if len(value) <= width else value[: width - 3] + "...", number))
+        return tabulate(lines, headers=COLUMNS) + f"\n\n{len(self)} values\n"
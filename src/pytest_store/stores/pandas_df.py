@@ -1,13 +1,11 @@
 from __future__ import annotations
 import contextlib
-import io
 from pathlib import Path
 import sqlite3
-from typing import Optional, Union
+from typing import AbstractSet, Optional, Union
 
 import numpy as np
 import pandas as pd
-from icecream import ic
 
 with contextlib.suppress(ModuleNotFoundError):
     from rich import print
@@ -15,65 +13,110 @@ with contextlib.suppress(ModuleNotFoundError):
 
 from pytest_store.types import STORE_TYPES
 
-from pytest_store.stores._store_base import StoreBase, SaveSettings, SaveExtras
+from pytest_store.stores._store_base import IPC_FORMATS, StoreBase, SaveSettings, SaveExtras, max_columns
+from pytest_store.stores._columns import ColumnTable
 
 
 class PandasDF(StoreBase):
+    """Store backed by a pandas data frame.
+
+    The values are kept in typed columns (see `ColumnTable`), numeric columns in `array` buffers
+    with a validity mask. The data frame is built when `data` is read.
+    """
+
     def __init__(self):
         super().__init__()
-        self._data = pd.DataFrame(columns=["RUN"], index=[0])
+        self._table = ColumnTable()
+        self._row = 0
         self._idx = None
         self.set_index(0)
 
+    @property
+    def data(self) -> pd.DataFrame:
+        size = len(self._table)
+        runs = np.array(self._table.runs, dtype=np.int64)
+        columns: dict[str, object] = {"RUN": runs}
+        for name, column in self._table.columns.items():
+            values, mask = column.to_numpy(size)
+            if mask.any():
+                if column.kind == "float":
+                    values[mask] = np.nan
+                elif column.kind == "int":
+                    values = pd.arrays.IntegerArray(values, mask)
+                elif column.kind == "bool":
+                    values = pd.arrays.BooleanArray(values, mask)
+            columns[name] = values
+        return pd.DataFrame(columns, index=runs)
+
     def set_index(self, idx: int):
         self._idx = idx
-        if idx not in self._data.index:
-            # print(f"index '{idx}' is missing, add it")
-            if len(self._data.iloc[0].values):
-                self._data.loc[idx] = self._data.loc[0]
-                self._data.loc[idx, :] = None
-            else:
-                self._data = pd.concat([self._data, pd.DataFrame({}, index=[idx])])
-            self._data["RUN"] = self._data.index.copy()
+        self._row = self._table.row(idx)
 
     def set(self, name: str, value: STORE_TYPES):
-        if isinstance(value, (dict, list)):
-            self._data.at[self._idx, name] = None
-        self._data.at[self._idx, name] = value
+        self._drop_append_buffer(name)
+        self._table.set(self._row, name, value)
         return value
 
+    def set_many(self, values: dict[str, STORE_TYPES]):
+        self._drop_append_buffers(values)
+        self._table.set_many(self._row, values)
+        return values
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES]):
+        for run, value in values.items():
+            if self._append_buffers:
+                self._append_buffers.pop((run, name), None)
+            self._table.set(self._table.row(run), name, value)
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        self._drop_run_buffers(runs)
+        self._table.drop_runs(runs)
+        self._row = self._table.row(self._idx)
+
     def get(
         self, name: Optional[str] = None, default: STORE_TYPES = None
     ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
         if name is None:
-            return self._data.loc[self._idx]
-        try:
-            val = self._data.at[self._idx, name]
-        except KeyError:
-            return default
-        # if val is None or np.isnan(val):
-        if not isinstance(val, list) and val is not None and np.isnan(val):
+            return pd.Series({"RUN": self._idx, **self._table.row_values(self._row)}, name=self._idx)
+        val = self._table.get(self._row, name)
+        if val is None or (isinstance(val, float) and np.isnan(val)):
             return default
         return val
 
+    def rows(self):
+        return self._table.iter_rows()
+
     def to_string(self, max_lines=30, max_width=0):
-        f = io.StringIO()
-        with contextlib.redirect_stdout(f):
-            _idx = self._data.index.copy()
-            self._data.index = [""] * len(_idx)
-            with pd.option_context("display.max_rows", max_lines):
-                print(self._data)
-            self._data.index = _idx
-        return f.getvalue()
+        """Only the first and last rows and columns are taken from the typed columns."""
+        table = self._table
+        size = len(table)
+        half = max(1, max_lines // 2)
+        # one more row and column on each side than shown, pandas adds the '...'
+        rows = list(range(size)) if size <= max_lines else [*range(half + 1), *range(size - half - 1, size)]
+        cols = max_columns(max_width)
+        names = list(table.columns)
+        side = cols // 2 + 1
+        if len(names) > 2 * side:
+            names = names[:side] + names[-side:]
+        data = pd.DataFrame(
+            {"RUN": [table.runs[row] for row in rows], **{name: [table.get(row, name) for row in rows] for name in names}},
+            index=[""] * len(rows),
+        ).convert_dtypes()
+        text = data.to_string(max_rows=max_lines, max_cols=cols + 1, line_width=max_width or None)
+        return f"{text}\n\n[{size} rows x {len(table.columns) + 1} columns]\n"
 
     def save(self, __save_settings: Union[None, SaveSettings] = None, __extras: Union[None, SaveExtras] = None):
         """See https://pandas.pydata.org/docs/reference/io.html"""
         settings = self._save_settings_list if __save_settings is None else [__save_settings]
         extras = __extras if __extras else SaveExtras()
         extras.settings = settings
-        for cfg in settings:
+        data = self.data
+
+        def write(cfg: SaveSettings):
+            if cfg.format in IPC_FORMATS:
+                data.reset_index(drop=True).to_feather(cfg.path, **cfg.options)
+                return
             cfg.default_options({"index": False})
-            # print(f"Format '{cfg.format}'", settings)
             if cfg.format in ["xls", "xlsx"]:
                 cfg.format = "excel"
                 cfg.default_options(
@@ -87,20 +130,24 @@ class PandasDF(StoreBase):
                 cfg.format = "markdown"
             func = f"to_{cfg.format}"
             if cfg.format == "sqlite":
-                self._save_sqlite(cfg.path, cfg.format, **cfg.options)
-            elif hasattr(self._data, func):
-                getattr(self._data, func)(cfg.path, **cfg.options)
+                self._save_sqlite(data, cfg.path, cfg.format, **cfg.options)
+            elif hasattr(data, func):
+                getattr(data, func)(cfg.path, **cfg.options)
             else:
                 msg = f"Format '{cfg.format}' not supportd by pandas (file: {cfg.path}), see 'https://pandas.pydata.org/docs/reference/io.html'"
                 raise UserWarning(msg)
+
+        self._save_all(settings, write)
         return extras
 
-    def _save_sqlite(self, path: Union[str, Path], format: str, **options):
+    def _save_sqlite(self, data: pd.DataFrame, path: Union[str, Path], format: str, **options):
         cnx = sqlite3.connect(path)
-        self._data.to_sql(name="store", con=cnx, **options)
+        data.to_sql(name="store", con=cnx, **options)
 
 
 if __name__ == "__main__":
+    from icecream import ic
+
     store = PandasDF()
 
     store.set_index(1)
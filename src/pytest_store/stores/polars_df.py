@@ -1,15 +1,10 @@
 from __future__ import annotations
 import contextlib
-import io
+import os
 from pathlib import Path
-from xlsxwriter import Workbook
-import sqlite3
-from typing import Literal, Optional, Union
-
-import numpy as np
+from typing import AbstractSet, Optional, Union
 
 import polars as pl
-from icecream import ic
 
 with contextlib.suppress(ModuleNotFoundError):
     from rich import print
@@ -17,47 +12,120 @@ with contextlib.suppress(ModuleNotFoundError):
 
 from pytest_store.types import STORE_TYPES
 
-from pytest_store.stores._store_base import StoreBase, SaveSettings, SaveExtras
+from pytest_store.stores._store_base import IPC_FORMATS, StoreBase, SaveSettings, SaveExtras, max_columns
 
 
 class PolarsDF(StoreBase):
+    """Store backed by a polars data frame.
+
+    Writes are collected in an append-only buffer per column (run -> value) and are only
+    merged into the data frame when it is needed (`data`, `get()` without name, `to_string()`
+    and `save()`), all pending columns with one join.
+    A run -> row index is kept next to the frame, new runs are added as pending rows as well.
+    """
+
     def __init__(self):
         super().__init__()
         self._data: pl.DataFrame = pl.DataFrame({"RUN": [0]})
+        self._pending: dict[str, dict[int, STORE_TYPES]] = {}
+        self._rows: dict[int, int] = {0: 0}  # run -> row offset
+        self._new_runs: list[int] = []
+        self._max_run = 0
         self._idx = 0
         self.set_index(0)
 
+    @property
+    def data(self) -> pl.DataFrame:
+        self._flush()
+        return self._data
+
+    def _flush(self):
+        """Merge the pending rows and writes into the data frame."""
+        if self._new_runs:
+            new_df = pl.DataFrame({"RUN": self._new_runs}, schema={"RUN": self._data.schema["RUN"]})
+            self._data = pl.concat([self._data, new_df], how="diagonal")
+            self._new_runs = []
+        if not self._pending:
+            return
+        runs = list(dict.fromkeys(run for writes in self._pending.values() for run in writes))
+        update: dict[str, Union[list, pl.Series]] = {"RUN": runs}
+        columns = []
+        for i, (name, writes) in enumerate(self._pending.items()):
+            value_col, set_col = f"__value_{i}", f"__set_{i}"
+            update[value_col] = pl.Series(value_col, [writes.get(run) for run in runs], strict=False)
+            update[set_col] = [run in writes for run in runs]
+            otherwise = pl.col(name) if name in self._data.columns else None
+            columns.append(pl.when(pl.col(set_col)).then(pl.col(value_col)).otherwise(otherwise).alias(name))
+        self._pending = {}
+        update_df = pl.DataFrame(update)
+        self._data = (
+            self._data.join(update_df, on="RUN", how="left", maintain_order="left")
+            .with_columns(columns)
+            .drop([c for c in update_df.columns if c != "RUN"])
+        )
+
     def set_index(self, idx: int):
-        self._idx = idx
-        if not self._data.filter(pl.col("RUN") == idx).shape[0]:
-            # print(f"index {idx} is missing, add it")
-            # self._data = pl.concat([self._data, pl.DataFrame({"index": [idx]})])
-            new_df = self._data.clear(1)
-            new_df[0, "RUN"] = idx
-            self._data.extend(new_df)
-            # if len(self._data.iloc[0].values):
-            #    self._data.loc[idx] = self._data.loc[0]
-            #    self._data.loc[idx, :] = None
-            # else:
-            #    self._data = pl.concat([self._data, pl.DataFrame({}, index=[idx])])
+        if idx != self._idx:
+            self._idx = idx
+            self._drop_other_run_buffers()
+        self._add_run(idx)
+
+    def _add_run(self, run: int):
+        # fast path: runs arrive in order, a new run is simply the next row
+        if run > self._max_run or run not in self._rows:
+            self._rows[run] = len(self._rows)
+            self._new_runs.append(run)
+            self._max_run = max(self._max_run, run)
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES]):
+        for run in values:
+            self._add_run(run)
+            if self._append_buffers:
+                self._append_buffers.pop((run, name), None)
+        self._pending.setdefault(name, {}).update(values)
 
     def set(self, name: str, value: STORE_TYPES):
-        otherwise = pl.col(name) if name in self._data.columns else None
-        if isinstance(value, str):
-            value = pl.lit(value)
-        _updated = self._data.select(pl.when(pl.col("RUN") == self._idx).then(value).otherwise(otherwise).alias(name))
-        self._data = self._data.with_columns(_updated)
+        self._drop_append_buffer(name)
+        self._pending.setdefault(name, {})[self._idx] = value
         return value
 
+    def set_many(self, values: dict[str, STORE_TYPES]):
+        self._drop_append_buffers(values)
+        pending, idx = self._pending, self._idx
+        for name, value in values.items():
+            writes = pending.get(name)
+            if writes is None:
+                writes = pending[name] = {}
+            writes[idx] = value
+        return values
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        self._drop_run_buffers(runs)
+        self._flush()
+        data = self._data.filter(~pl.col("RUN").is_in(list(runs)))
+        # columns of dropped tests
+        self._data = data.select(c for c in data.columns if c == "RUN" or data[c].null_count() < data.height)
+        self._rows = {run: row for row, run in enumerate(self._data.get_column("RUN").to_list())}
+        self._add_run(self._idx)
+
+    def _appended(self, name: str, buffer: list):
+        # the frame holds a copy, stage the buffer again
+        self._pending.setdefault(name, {})[self._idx] = buffer
+
     def get(
         self, name: Optional[str] = None, default: STORE_TYPES = None
     ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
+        row = self._rows[self._idx]
         if name is None:
-            return self._data.filter(pl.col("RUN") == self._idx)
-            # return self._data.loc[self._idx]
-        # return self._data[int(self._idx), name]
+            return self.data.slice(row, 1)
+        writes = self._pending.get(name)
+        if writes is not None and self._idx in writes:
+            value = writes[self._idx]
+            return default if value is None else value
+        if row >= self._data.height:  # pending row
+            return default
         try:
-            value = self._data.filter(pl.col("RUN") == self._idx)[name].item()
+            value = self._data.get_column(name)[row]
         except pl.exceptions.ColumnNotFoundError:
             return default
         if value is None:
@@ -66,22 +134,52 @@ class PolarsDF(StoreBase):
             value = value.to_list()
         return value
 
+    def load(self, path: Union[str, Path], format: Optional[str] = None) -> Optional[int]:
+        """Arrow IPC files are memory mapped and used as data frame without copy if the store is empty."""
+        path = Path(path)
+        if (format or path.suffix[1:]) not in IPC_FORMATS or not self._is_empty():
+            return super().load(path, format)
+        data = pl.read_ipc(path, memory_map=True)
+        if "RUN" not in data.columns:
+            raise UserWarning(f"File '{path}' has no 'RUN' column.")
+        if data.height == 0:
+            return None
+        runs = data.get_column("RUN").to_list()
+        self._data = data
+        self._rows = {run: row for row, run in enumerate(runs)}
+        self._new_runs = []
+        last_run = int(max(runs))
+        self._max_run = last_run
+        self._idx = runs[-1]
+        return last_run
+
+    def _is_empty(self) -> bool:
+        return not self._pending and self._data.width == 1 and len(self._rows) == 1
+
+    def rows(self):
+        for row in self.data.iter_rows(named=True):
+            run = row.pop("RUN")
+            yield run, {name: value for name, value in row.items() if value is not None}
+
     def to_string(self, max_lines=30, max_width=0):
-        f = io.StringIO()
-        with contextlib.redirect_stdout(f):
-            # with pl.option_context("display.max_rows", max_lines):
-            print(self._data)
-        return f.getvalue()
+        """Polars formats only the first and last rows and columns of the frame."""
+        options = {"tbl_rows": max_lines, "tbl_cols": max_columns(max_width)}
+        if max_width:
+            options["tbl_width_chars"] = max_width
+        data = self.data
+        with pl.Config(**options):
+            return f"{data}\n"
 
     def save(self, __save_settings: Union[None, SaveSettings] = None, __extras: Union[None, SaveExtras] = None):
         """See https://pandas.pydata.org/docs/reference/io.html"""
         settings = self._save_settings_list if __save_settings is None else [__save_settings]
         extras = __extras if __extras else SaveExtras()
         extras.settings = settings
-        for cfg in settings:
-            if cfg.format == "json":
-                cfg.default_options({"row_oriented": True, "pretty": True})
-            elif cfg.format in ["xls", "xlsx"]:
+        self._flush()
+        data = self._data
+
+        def write(cfg: SaveSettings):
+            if cfg.format in ["xls", "xlsx"]:
                 cfg.format = "excel"
                 cfg.default_options(
                     {
@@ -94,24 +192,22 @@ class PolarsDF(StoreBase):
             func = f"write_{cfg.format}"
             if cfg.format in ["sqlite", "sql"]:
                 uri = f"sqlite:///{cfg.path}"
-                cfg.default_options({"table_name": cfg.name, "connection": uri, "if_exists": "replace"})
-                self._data.write_database(**cfg.options)
+                cfg.default_options({"table_name": cfg.name, "connection": uri, "if_table_exists": "replace"})
+                data.write_database(**cfg.options)
             elif cfg.format == "excel":
-                # wb = extras.get_extras("excel").get("workbook", Workbook(cfg.path))
-                # ic(wb)
-                # _read = pl.read_excel(cfg.path)
-                # ic(_read)
-                # if isinstance(_read, dict):
-                #    for sheet, df in _read.items():
-                #        df.write_excel(workbook=wb, table_name=sheet, worksheet=sheet)
-                # else:
-                #    _read.write_excel(workbook=wb)
-                extras.set_extras("excel", {"workbook": self._data.write_excel(workbook=cfg.path, **cfg.options)})
-            elif hasattr(self._data, func):
-                getattr(self._data, func)(cfg.path, **cfg.options)
+                extras.set_extras("excel", {"workbook": data.write_excel(workbook=cfg.path, **cfg.options)})
+            elif cfg.format in IPC_FORMATS:
+                # replace the file, it may be memory mapped by 'load()'
+                tmp_path = Path(f"{cfg.path}.tmp")
+                data.write_ipc(tmp_path, **cfg.options)
+                os.replace(tmp_path, cfg.path)
+            elif hasattr(data, func):
+                getattr(data, func)(cfg.path, **cfg.options)
             else:
                 msg = f"Format '{cfg.format}' not supportd by polars, see 'https://pola-rs.github.io/polars/py-polars/html/reference/io.html'"
                 raise UserWarning(msg)
+
+        self._save_all(settings, write)
         return extras
 
     # def _save_sqlite(self, path: Union[str, Path], format: str, **options):
@@ -120,6 +216,8 @@ class PolarsDF(StoreBase):
 
 
 if __name__ == "__main__":
+    from icecream import ic
+
     ic()
     store = PolarsDF()
 
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import contextlib
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+from typing import AbstractSet, Optional, Union
+import weakref
+
+import msgspec
+
+from pytest_store.types import STORE_TYPES
+from pytest_store.stores._store_base import StoreBase, SaveSettings, SaveExtras, head_tail_yaml
+from pytest_store.stores._append import SQLITE_FORMATS, append_rows, last_run
+
+# kind of the columns which are not stored as they are, see 'SqliteStream._encode'
+KINDS_TABLE = "_store_columns"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _close(con: sqlite3.Connection, temp_path: Optional[Path]):
+    con.close()
+    if temp_path is not None:
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{temp_path}{suffix}")
+
+
+class SqliteStream(StoreBase):
+    """Store which streams the values to a sqlite database.
+
+    Values are buffered and written in batches (every `batch_size` values and when the run changes)
+    inside a transaction, columns are added when they are first seen.
+    The database is the first sqlite file set with `save_to` or a temporary file.
+    Bool and list/dict (JSON) columns are recorded in the `_store_columns` table to decode them after reopening.
+    """
+
+    def __init__(self, path: Union[None, str, Path] = None, table: str = "store", batch_size: int = 500):
+        super().__init__()
+        self._path = Path(path) if path is not None else None
+        self._table = table
+        self._batch_size = batch_size
+        self._con: Optional[sqlite3.Connection] = None
+        self._columns: dict[str, str] = {}  # name -> kind ('', 'bool' or 'json')
+        self._pending: dict[int, dict[str, STORE_TYPES]] = {}
+        self._pending_count = 0
+        self._data = []
+        self._idx = None
+        self.set_index(0)
+
+    @property
+    def data(self) -> list[dict[str, STORE_TYPES]]:
+        return [{"RUN": run, **values} for run, values in self.rows()]
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self._path
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._con is not None:
+            return self._con
+        temp_path = None
+        if self._path is None:
+            for cfg in self._save_settings_list:
+                if cfg.format in SQLITE_FORMATS:
+                    self._path = Path(cfg.path)
+                    break
+        if self._path is None:
+            fd, name = tempfile.mkstemp(prefix="pytest-store-", suffix=".sqlite")
+            os.close(fd)
+            self._path = temp_path = Path(name)
+        self._con = sqlite3.connect(self._path, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.execute(f"CREATE TABLE IF NOT EXISTS {_quote(self._table)} (RUN INTEGER PRIMARY KEY)")
+        self._con.execute(
+            f"CREATE TABLE IF NOT EXISTS {KINDS_TABLE} (tbl TEXT, name TEXT, kind TEXT, PRIMARY KEY (tbl, name))"
+        )
+        kinds = dict(self._con.execute(f"SELECT name, kind FROM {KINDS_TABLE} WHERE tbl = ?", (self._table,)))
+        for column in self._con.execute(f"PRAGMA table_info({_quote(self._table)})"):
+            if column[1] != "RUN":
+                self._columns.setdefault(column[1], kinds.get(column[1], ""))
+        weakref.finalize(self, _close, self._con, temp_path)
+        return self._con
+
+    def _encode(self, name: str, value: STORE_TYPES):
+        kind = self._columns.get(name)
+        if kind is None:
+            kind = "json" if isinstance(value, (list, dict)) else "bool" if isinstance(value, bool) else ""
+        if isinstance(value, (list, dict)):
+            value = msgspec.json.encode(value).decode("utf-8")
+        return kind, value
+
+    def _decode(self, name: str, value):
+        kind = self._columns.get(name, "")
+        if value is None or not kind:
+            return value
+        if kind == "bool":
+            return bool(value)
+        if isinstance(value, str):
+            return msgspec.json.decode(value)
+        return value
+
+    def flush(self):
+        """Write the pending values in one transaction."""
+        if not self._pending:
+            return
+        con = self._connection()
+        table = _quote(self._table)
+        statements: dict[tuple[str, ...], list[tuple]] = {}
+        new_columns = []
+        for run, values in self._pending.items():
+            params = [run]
+            for name, value in values.items():
+                kind, value = self._encode(name, value)
+                if name not in self._columns:
+                    self._columns[name] = kind
+                    new_columns.append(name)
+                params.append(value)
+            statements.setdefault(tuple(values), []).append(tuple(params))
+        con.execute("BEGIN")
+        try:
+            for name in new_columns:
+                con.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(name)}")
+            kinds = [(self._table, name, self._columns[name]) for name in new_columns if self._columns[name]]
+            if kinds:
+                con.executemany(f"INSERT OR REPLACE INTO {KINDS_TABLE} VALUES (?, ?, ?)", kinds)
+            for names, params in statements.items():
+                columns = ", ".join(["RUN", *(_quote(n) for n in names)])
+                placeholders = ", ".join("?" * (len(names) + 1))
+                if names:
+                    update = ", ".join(f"{_quote(n)}=excluded.{_quote(n)}" for n in names)
+                    conflict = f"DO UPDATE SET {update}"
+                else:
+                    conflict = "DO NOTHING"
+                sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT(RUN) {conflict}"
+                con.executemany(sql, params)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            for name in new_columns:
+                del self._columns[name]
+            raise
+        self._pending = {}
+        self._pending_count = 0
+
+    def set_index(self, idx: int):
+        if idx != self._idx:
+            if self._pending:
+                self.flush()
+            self._idx = idx
+            self._drop_other_run_buffers()
+        self._pending.setdefault(idx, {})
+
+    def set(self, name: str, value: STORE_TYPES):
+        self._drop_append_buffer(name)
+        self._pending.setdefault(self._idx, {})[name] = value
+        self._pending_count += 1
+        if self._pending_count >= self._batch_size:
+            self.flush()
+        return value
+
+    def set_many(self, values: dict[str, STORE_TYPES]):
+        self._drop_append_buffers(values)
+        self._pending.setdefault(self._idx, {}).update(values)
+        self._pending_count += len(values)
+        if self._pending_count >= self._batch_size:
+            self.flush()
+        return values
+
+    def set_column(self, name: str, values: dict[int, STORE_TYPES]):
+        for run, value in values.items():
+            if self._append_buffers:
+                self._append_buffers.pop((run, name), None)
+            self._pending.setdefault(run, {})[name] = value
+        self._pending_count += len(values)
+        if self._pending_count >= self._batch_size:
+            self.flush()
+
+    def _appended(self, name: str, buffer: list):
+        # the database holds a copy, stage the buffer again
+        self._pending.setdefault(self._idx, {})[name] = buffer
+
+    def get(
+        self, name: Optional[str] = None, default: STORE_TYPES = None
+    ) -> Union[dict[str, STORE_TYPES], STORE_TYPES]:
+        if name is None:
+            self.flush()
+            cursor = self._connection().execute(f"SELECT * FROM {_quote(self._table)} WHERE RUN = ?", (self._idx,))
+            row = cursor.fetchone()
+            if row is None:
+                return {}
+            names = [c[0] for c in cursor.description]
+            return {n: self._decode(n, v) for n, v in zip(names, row) if n != "RUN" and v is not None}
+        pending = self._pending.get(self._idx, {})
+        if name in pending:
+            value = pending[name]
+        elif name in self._columns and self._con is not None:
+            row = self._con.execute(
+                f"SELECT {_quote(name)} FROM {_quote(self._table)} WHERE RUN = ?", (self._idx,)
+            ).fetchone()
+            value = self._decode(name, row[0]) if row is not None else None
+        else:
+            value = None
+        return default if value is None else value
+
+    def rows(self):
+        self.flush()
+        if self._con is None:
+            return
+        yield from self._rows(self._con)
+
+    def _rows(
+        self, con: sqlite3.Connection, descending: bool = False, first: Optional[int] = None, last: Optional[int] = None
+    ):
+        """Rows ordered by RUN, only the runs from 'first' to 'last' if given."""
+        order = "DESC" if descending else "ASC"
+        where = " AND ".join(f"RUN {op} {int(run)}" for op, run in ((">=", first), ("<=", last)) if run is not None)
+        where = f" WHERE {where}" if where else ""
+        cursor = con.execute(f"SELECT * FROM {_quote(self._table)}{where} ORDER BY RUN {order}")
+        names = [c[0] for c in cursor.description]
+        for row in cursor:
+            values = {n: self._decode(n, v) for n, v in zip(names[1:], row[1:]) if v is not None}
+            yield row[0], values
+
+    def _select_rows(self, runs: AbstractSet[int]):
+        self.flush()
+        if self._con is None or not runs:
+            return
+        for run, values in self._rows(self._con, first=min(runs), last=max(runs)):
+            if run in runs:
+                yield run, values
+
+    def save(self, __save_settings: Union[None, SaveSettings] = None, __extras: Union[None, SaveExtras] = None):
+        """Sqlite targets are copied with the backup api, other formats are encoded with msgspec."""
+        settings = self._save_settings_list if __save_settings is None else [__save_settings]
+        extras = __extras if __extras else SaveExtras()
+        extras.settings = settings
+        self.flush()
+        self._connection()
+        source_path = self._path
+
+        def write(cfg: SaveSettings):
+            if cfg.format == "yml":
+                cfg.format = "yaml"
+            if cfg.format in SQLITE_FORMATS:
+                if source_path is None or Path(cfg.path).resolve() == source_path.resolve():
+                    return
+                # own connections, a sqlite connection can not be shared between threads
+                source = sqlite3.connect(source_path)
+                target = sqlite3.connect(cfg.path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+            elif hasattr(msgspec, cfg.format) and hasattr(getattr(msgspec, cfg.format), "encode"):
+                enc_cmd = getattr(getattr(msgspec, cfg.format), "encode")
+                # only these formats load the database into memory, with an own connection for the thread
+                con = sqlite3.connect(source_path)  # type: ignore[arg-type]
+                try:
+                    data = [{"RUN": run, **values} for run, values in self._rows(con)]
+                finally:
+                    con.close()
+                with open(cfg.path, "wb") as file:
+                    file.write(enc_cmd(data))
+            else:
+                msg = f"Format '{cfg.format}' not supported by sqlite-stream (file: {cfg.path})."
+                raise UserWarning(msg)
+
+        self._save_all(settings, write)
+        return extras
+
+    def _is_own_file(self, cfg: SaveSettings) -> bool:
+        if cfg.format not in SQLITE_FORMATS:
+            return False
+        if self._path is None:  # the first sqlite file is used
+            return next((c for c in self._save_settings_list if c.format in SQLITE_FORMATS), None) is cfg
+        return Path(cfg.path).resolve() == self._path.resolve()
+
+    def _append(self, cfg: SaveSettings, runs: Optional[AbstractSet[int]] = None):
+        if self._is_own_file(cfg):  # already written
+            return
+        self.flush()
+        self._connection()
+        # own connection, the files are written on a thread pool
+        con = sqlite3.connect(self._path)  # type: ignore[arg-type]
+        try:
+            if runs is None:
+                rows = self._rows(con, first=cfg.append_from)
+            elif runs:
+                rows = ((run, values) for run, values in self._rows(con, first=min(runs), last=max(runs)) if run in runs)
+            else:
+                rows = iter(())
+            append_rows(Path(cfg.path), cfg.format, rows, name=cfg.name)
+        finally:
+            con.close()
+
+    def drop_runs(self, runs: AbstractSet[int]):
+        """Nothing to do, the values are in the database and not in memory."""
+        self._drop_run_buffers(runs)
+
+    def _last_run(self, cfg: SaveSettings):
+        if self._is_own_file(cfg):
+            return last_run(Path(cfg.path), cfg.format, name=self._table)
+        return super()._last_run(cfg)
+
+    def to_string(self, max_lines=40, max_width=0):
+        self.flush()
+        con = self._connection()
+        total = con.execute(f"SELECT COUNT(*) FROM {_quote(self._table)}").fetchone()[0]
+        head = ({"RUN": run, **values} for run, values in self._rows(con))
+        tail = ({"RUN": run, **values} for run, values in self._rows(con, descending=True))
+        return head_tail_yaml(head, tail, total, max_lines, max_width)
@@ -0,0 +1,73 @@
+"""Support for pytest-xdist, the workers send their stored rows to the controller which merges them."""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import pytest
+
+from .store import store
+from .types import STORE_TYPES
+
+workeroutput_key = "pytest_store"
+
+
+def is_xdist_worker(config: pytest.Config) -> bool:
+    return hasattr(config, "workerinput")
+
+
+def send_rows(config: pytest.Config, all_passed: dict[int, bool]):
+    """Add the rows of all stores as msgpack encoded batch to the worker output."""
+    import msgspec
+
+    stores = {name: list(s.rows()) for name, s in store._stores.items()}
+    config.workeroutput[workeroutput_key] = msgspec.msgpack.encode(  # type: ignore[attr-defined]
+        {"stores": stores, "all_passed": all_passed}
+    )
+
+
+class XdistStoreHooks:
+    """Registered on the controller, merges the rows of each worker by 'RUN' and name.
+
+    The rows are collected when the workers finish and added to the stores ordered by 'RUN' before they are saved.
+    """
+
+    def __init__(self, all_pass_key: pytest.StashKey[dict]):
+        self._all_pass_key = all_pass_key
+        self._session: Optional[pytest.Session] = None
+        self._rows: dict[str, dict[int, dict[str, STORE_TYPES]]] = {}  # store -> run -> values of all workers
+
+    def pytest_sessionstart(self, session: pytest.Session):
+        self._session = session
+
+    def pytest_testnodedown(self, node: Any, error: Any):
+        payload = getattr(node, "workeroutput", {}).get(workeroutput_key)
+        if payload is None:
+            return
+        import msgspec
+
+        data = msgspec.msgpack.decode(payload)
+        for name, rows in data["stores"].items():
+            runs = self._rows.setdefault(name, {})
+            for run, values in rows:
+                runs.setdefault(run, {}).update(values)
+        if self._session is not None:
+            all_passed = self._session.stash.setdefault(self._all_pass_key, {})
+            for run, passed in data["all_passed"].items():
+                all_passed[run] = all_passed.get(run, True) and passed
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionfinish(self, session: pytest.Session):
+        rows_by_store, self._rows = self._rows, {}
+        for name, runs in rows_by_store.items():
+            if name not in store._stores:
+                store.add_store(name)
+            target = store._stores.get(name)
+            if target is None:
+                continue
+            # worker runs start at 0, continue after loaded or resumed runs
+            rows = [(run + store.run_offset, runs[run]) for run in sorted(runs)]
+            target.merge_rows(rows)
+            if target is store.store:  # e.g. checkpoint and dataset writers
+                for run, values in rows:
+                    for value_name, value in values.items():
+                        store._record(run, value_name, value)
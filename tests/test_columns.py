@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+from pytest_store.stores._columns import Column, ColumnTable
+
+
+def test_column_promote():
+    column = Column()
+    column.set(2, 1)
+    assert column.kind == "int"
+    assert isinstance(column.values, array)
+    assert [column.get(row) for row in range(3)] == [None, None, 1]
+    column.set(0, 0.5)
+    assert column.kind == "float"
+    assert [column.get(row) for row in range(3)] == [0.5, None, 1.0]
+    column.set(1, "text")
+    assert column.kind == "object"
+    assert [column.get(row) for row in range(3)] == [0.5, "text", 1.0]
+
+
+def test_column_table():
+    table = ColumnTable()
+    for run in (3, 1):
+        row = table.row(run)
+        table.set(row, "flag", run == 3)
+    table.set(table.row(1), "value", None)
+    assert table.row(3) == 0
+    assert list(table.iter_rows()) == [(3, {"flag": True}), (1, {"flag": False})]
+    values, mask = table.columns["flag"].to_numpy(3)
+    assert values.tolist()[:2] == [True, False]
+    assert mask.tolist() == [False, False, True]
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+
+def test_xdist_merge(pytester):
+    pytester.makepyfile(
+        """
+        import pytest
+        from pytest_store import store
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_value(i):
+            store.set("value", i)
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "-n", "2", "--store-type", "list-dict", "--store-save", "out.json", "-p", "no:cacheprovider"
+    )
+    result.assert_outcomes(passed=4)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert len(data) == 1
+    assert {data[0][f"value[{i}].value"] for i in range(4)} == {0, 1, 2, 3}
+    assert not list(pytester.path.glob("*.bak*"))
+
+
+def test_xdist_merge_run_order(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", store.get_index())
+        """
+    )
+    args = ["-n", "2", "--count", "6", "--repeat-scope", "session", "--store-type", "pl", "--store-save", "out.jsonl"]
+    pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider").assert_outcomes(passed=6)
+    lines = [json.loads(line) for line in (pytester.path / "out.jsonl").read_text().splitlines()]
+    assert [line["RUN"] for line in lines] == list(range(6))
+    assert [line["value.value"] for line in lines] == list(range(6))
+
+
+def test_checkpoint_resume(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", store.get_index())
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-checkpoint", "ckpt.jsonl", "-p", "no:cacheprovider"]
+    pytester.runpytest_subprocess(*args).assert_outcomes(passed=1)
+    lines = (pytester.path / "ckpt.jsonl").read_text().splitlines()
+    assert [json.loads(line)["RUN"] for line in lines] == [0]
+    # a crash while writing leaves an incomplete line
+    with open(pytester.path / "ckpt.jsonl", "a") as file:
+        file.write('{"RUN": 0, "val')
+    pytester.runpytest_subprocess(*args, "--store-checkpoint-resume", "--store-save", "out.json").assert_outcomes(passed=1)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert [row.get("value.value") for row in data] == [0, 0]
+    # the incomplete line is removed before the resumed session appends
+    lines = (pytester.path / "ckpt.jsonl").read_text().splitlines()
+    assert [json.loads(line)["RUN"] for line in lines] == [0, 1]
+
+
+def test_checkpoint_read_skips_incomplete_lines(tmp_path):
+    from pytest_store.checkpoint import Checkpoint
+
+    path = tmp_path / "ckpt.jsonl"
+    path.write_text('{"RUN": 0, "a": 1}\n{"RUN": 1, "a\n{"RUN": 2, "a": 3}\n')
+    assert dict(Checkpoint.read(path)) == {0: {"a": 1}, 2: {"a": 3}}
+
+
+def test_no_store_no_hooks(pytester):
+    pytester.makepyfile(
+        """
+        def test_hooks(request):
+            assert not request.config.pluginmanager.has_plugin("store-test-hooks")
+            assert not hasattr(request.node, "_store_testname")
+        """
+    )
+    result = pytester.runpytest_subprocess("--store-type", "none", "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    assert "stored values summary" not in result.stdout.str()
+
+
+def test_overhead(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", 1)
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "--store-type", "list-dict", "--store-overhead", "--store-save", "out.json", "-p", "no:cacheprovider"
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*store overhead*", "pytest_runtest_protocol *1 *", "Store.set *4 *"])
+    data = json.loads((pytester.path / "out_store_overhead.json").read_text())
+    assert len(data) == 4  # one row per call, 'Store.set' is called most
+    assert data[0]["pytest_runtest_logreport"] > 0
+
+
+def test_metrics(pytester):
+    pytester.makepyfile(
+        """
+        def test_value():
+            sum(range(10000))
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "--store-type", "list-dict", "--store-metrics=default", "--store-save", "out.json", "-p", "no:cacheprovider"
+    )
+    result.assert_outcomes(passed=1)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert data[0]["value.duration"] > 0
+    assert data[0]["value.cpu_time"] >= 0
+    assert data[0]["value.rss_peak"] >= 0
+    assert "value.io_read" not in data[0]
+
+
+def test_sampler_fixture(pytester):
+    pytester.makepyfile(
+        """
+        import time
+        import pytest
+
+        @pytest.mark.store_sampler(interval=0.001, value=lambda: 1)
+        def test_value(store_sampler):
+            while len(store_sampler._buffers["value"]) < 3:
+                time.sleep(0.001)
+        """
+    )
+    result = pytester.runpytest_subprocess("--store-type", "list-dict", "--store-save", "out.json", "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert set(data[0]["value.value"]) == {1}
+    assert len(data[0]["value.sample_time"]) == len(data[0]["value.value"])
+
+
+def test_store_load(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", store.get_index())
+        """
+    )
+    args = ["--store-type", "polars", "-p", "no:cacheprovider"]
+    pytester.runpytest_subprocess(*args, "--store-save", "first.arrow").assert_outcomes(passed=1)
+    result = pytester.runpytest_subprocess(*args, "--store-load", "first.arrow", "--store-save", "second.arrow")
+    result.assert_outcomes(passed=1)
+    import polars as pl
+
+    data = pl.read_ipc(pytester.path / "second.arrow")
+    assert data["RUN"].to_list() == [0, 1]
+    assert data["value.value"].to_list() == [0, 0]
+
+
+def test_save_append(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", store.get_index())
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-save", "out.jsonl", "--store-save-append", "-p", "no:cacheprovider"]
+    for _ in range(2):
+        pytester.runpytest_subprocess(*args).assert_outcomes(passed=1)
+    lines = [json.loads(line) for line in (pytester.path / "out.jsonl").read_text().splitlines()]
+    assert [(line["RUN"], line["value.value"]) for line in lines] == [(0, 0), (1, 0)]
+
+
+def test_save_dataset(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_value():
+            store.set("value", 1)
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-save", "ds", "--store-save-format", "dataset", "-p", "no:cacheprovider"]
+    result = pytester.runpytest_subprocess(*args, "--count", "5", "--store-partition-runs", "2")
+    result.assert_outcomes(passed=5)
+    parts = list((pytester.path / "ds").glob("session=*/*.parquet"))
+    assert len(parts) == 3
+    assert (pytester.path / "ds" / "_metadata").exists()
+
+
+def test_save_dataset_ini_options(pytester):
+    import pyarrow.parquet as pq
+
+    pytester.makepyfile("def test_a(): pass")
+    pytester.makeini(
+        """
+        [pytest]
+        store_save_options = {"compression": "zstd"}
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-save", "ds", "--store-save-format", "dataset", "-p", "no:cacheprovider"]
+    pytester.runpytest_subprocess(*args).assert_outcomes(passed=1)
+    part = next((pytester.path / "ds").glob("session=*/*.parquet"))
+    assert pq.read_metadata(part).row_group(0).column(0).compression == "ZSTD"
+
+
+def test_repeat_names(pytester):
+    pytester.makepyfile(
+        """
+        import pytest
+        from pytest_store import store
+
+        @pytest.mark.parametrize("x", ["a"])
+        def test_param(x):
+            store.set("value", x)
+
+        def test_plain():
+            store.set("value", 1)
+            store.set("other", 2)
+            assert store.get()["plain.other"] == 2
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-save", "out.json", "--count", "2", "-p", "no:cacheprovider"]
+    pytester.runpytest_subprocess(*args).assert_outcomes(passed=4)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert [sorted(n for n in row if n.endswith("value")) for row in data] == [["param[a].value", "plain.value"]] * 2
+
+
+def test_session_pass_column(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_a():
+            assert store.get_index() != 1
+
+        def test_b():
+            pass
+        """
+    )
+    args = ["--store-type", "pl", "--store-save", "out.json", "--count", "3", "--repeat-scope", "session"]
+    pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider").assert_outcomes(passed=5, failed=1)
+    data = json.loads((pytester.path / "out.json").read_text())
+    assert [row["PASS"] for row in data] == [True, False, True]
+
+
+def test_keep_runs(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_store import store
+
+        def test_a():
+            store.set("value", store.get_index())
+            assert store.get_index() != 3
+        """
+    )
+    args = ["--store-type", "pl", "--store-save", "out.jsonl", "--count", "30", "--repeat-scope", "session"]
+    result = pytester.runpytest_subprocess(*args, "--store-keep-runs", "5", "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=29, failed=1)
+    result.stdout.fnmatch_lines(["*24 runs dropped from memory*"])
+    rows = [json.loads(line) for line in (pytester.path / "out.jsonl").read_text().splitlines()]
+    assert [row["RUN"] for row in rows] == list(range(30))
+    assert [run for run, row in enumerate(rows) if not row["PASS"]] == [3]
+    aggregates = [json.loads(line) for line in (pytester.path / "out_store_aggregates.jsonl").read_text().splitlines()]
+    value = next(row for row in aggregates if row["name"] == "a.value")
+    assert (value["count"], value["mean"], value["max"]) == (30, 14.5, 29)
+
+
+def test_keep_runs_function_scope(pytester):
+    pytester.makepyfile(
+        """
+        def test_a():
+            pass
+
+        def test_b():
+            pass
+        """
+    )
+    args = ["--store-type", "list-dict", "--store-save", "out.jsonl", "--count", "20", "--store-keep-runs", "5"]
+    result = pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider")
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*--store-keep-runs with --count needs '--repeat-scope session'*"])
+    assert not (pytester.path / "out.jsonl").exists()
+
+
+def test_keep_runs_not_appendable(pytester):
+    pytester.makepyfile("def test_a(): pass")
+    args = ["--store-type", "list-dict", "--store-save", "out.json", "--store-keep-runs", "5"]
+    result = pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider")
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*Format 'json' can not be appended*"])
+
+
+def test_save_error_exit_status(pytester):
+    pytester.makepyfile("def test_a(): pass")
+    args = ["--store-type", "list-dict", "--store-save", "out.xyz"]
+    result = pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*out.xyz failed: UserWarning*"])
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+
+
+def test_overhead_replaced(pytester):
+    pytester.makepyfile("def test_a(): pass")
+    args = ["--store-type", "list-dict", "--store-overhead", "--store-save", "out.jsonl", "-p", "no:cacheprovider"]
+    for _ in range(2):
+        pytester.runpytest_subprocess(*args).assert_outcomes(passed=1)
+    lines = (pytester.path / "out_store_overhead.jsonl").read_text().splitlines()
+    runs = [json.loads(line)["RUN"] for line in lines]
+    assert runs == sorted(set(runs))
+
+
+def test_aggregates_save_error(pytester):
+    pytester.makepyfile("def test_a(): pass")
+    (pytester.path / "out_store_aggregates.jsonl").mkdir()
+    args = ["--store-type", "list-dict", "--store-save", "out.jsonl", "--store-keep-runs", "5"]
+    result = pytester.runpytest_subprocess(*args, "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    assert "INTERNALERROR" not in result.stdout.str() + result.stderr.str()
+    result.stdout.fnmatch_lines(["*out_store_aggregates.jsonl failed: *"])
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import statistics
+
+import pytest
+
+from pytest_store.retention import P2Quantile, RunningStats
+from pytest_store.store import Store
+from pytest_store.stores import Stores
+
+
+def test_running_stats():
+    rng = random.Random(1)
+    values = [rng.gauss(10, 2) for _ in range(10000)]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    result = stats.to_dict()
+    assert result["count"] == 10000
+    assert result["mean"] == pytest.approx(statistics.mean(values))
+    assert result["std"] == pytest.approx(statistics.stdev(values))
+    assert (result["min"], result["max"]) == (min(values), max(values))
+    exact = statistics.quantiles(values, n=100)
+    assert result["p50"] == pytest.approx(exact[49], abs=0.1)
+    assert result["p99"] == pytest.approx(exact[98], abs=0.2)
+
+
+def test_p2_quantile_few_values():
+    quantile = P2Quantile(0.5)
+    assert quantile.value is None
+    for value in (3, 1, 2):
+        quantile.add(value)
+    assert quantile.value == 2
+
+
+@pytest.mark.parametrize("store_type", ["list-dict", "pandas", "polars", "sqlite-stream", "long"])
+def test_keep_runs(tmp_path, store_type):
+    store = Store(Stores[store_type]())
+    store.set_keep_runs(10)
+    store.save_to(tmp_path / "out.jsonl")
+    with pytest.raises(UserWarning, match="Format 'json' can not be appended"):
+        store.save_to(tmp_path / "out.json")
+    for run in range(100):
+        store.set_index(run)
+        store.set("value", run, prefix="")
+        store.set(f"test{run}", run, prefix="")
+    assert store.retention.dropped == 90
+    in_memory = [run for run, _ in store.store.rows()]
+    if store_type == "sqlite-stream":  # in the database, not in memory
+        assert len(in_memory) == 100
+    else:
+        assert in_memory == list(range(90, 100))
+    assert store.aggregates()["value"]["mean"] == 49.5
+    assert store.aggregates()["value"]["count"] == 100
+    store.save()
+    lines = (tmp_path / "out.jsonl").read_text().splitlines()
+    if store_type != "long":
+        assert [json.loads(line)["RUN"] for line in lines] == list(range(100))
+
+
+def test_keep_runs_dropped_run_used_again():
+    store = Store(Stores["list-dict"]())
+    store.set_keep_runs(2)
+    for run in range(5):
+        store.set_index(run)
+    with pytest.raises(UserWarning, match="Run 0 was already dropped"):
+        store.set_index(0)
+
+
+def test_keep_runs_sparse(tmp_path):
+    store = Store(Stores["list-dict"]())
+    store.save_to(tmp_path / "out.jsonl")
+    store.set_keep_runs(10)
+    for run in range(1000):
+        store.set_index(run)
+        store.set("value", run, prefix="")
+    assert len(store.store._data) <= 11
+    text = store.to_string(max_lines=10)
+    assert "null" not in text
+    assert "RUN: 999" in text and "RUN: 0\n" not in text
+
+
+def test_keep_runs_not_appendable(tmp_path):
+    store = Store(Stores["list-dict"]())
+    store.save_to(tmp_path / "out.json")
+    with pytest.raises(UserWarning, match="Format 'json' can not be appended"):
+        store.set_keep_runs(10)
+    assert store.retention is None
+
+
+def test_keep_runs_append_error(tmp_path):
+    from pytest_store.stores._store_base import SaveError
+
+    store = Store(Stores["polars"]())
+    store.save_to(tmp_path / "out.arrows")
+    store.save_to(tmp_path / "out.jsonl")
+    store.set_keep_runs(5)
+    for run in range(30):
+        store.set_index(run)
+        store.set("a", run, prefix="")
+        if run >= 10:  # new column, the Arrow IPC stream can not get it
+            store.set("late", run, prefix="")
+    assert store.retention.stopped
+    assert [run for run, _ in store.store.rows()][-1] == 29
+    with pytest.raises(SaveError):
+        store.save()
+    lines = (tmp_path / "out.jsonl").read_text().splitlines()
+    assert [json.loads(line)["RUN"] for line in lines] == list(range(30))
+    assert store.aggregates()["a"]["count"] == 30
+
+
+def test_keep_runs_sqlite_stream_select_rows(tmp_path):
+    store = Stores["sqlite-stream"](tmp_path / "stream.sqlite")
+    for run in range(10):
+        store.set_index(run)
+        store.set("a", run)
+    assert list(store._select_rows({2, 4})) == [(2, {"a": 2}), (4, {"a": 4})]
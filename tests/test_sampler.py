@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from pytest_store.sampler import RingBuffer, Sampler
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(3)
+    for value in range(2):
+        buffer.append(value)
+    assert buffer.values() == [0, 1]
+    for value in range(2, 5):
+        buffer.append(value)
+    assert len(buffer) == 3
+    assert buffer.values() == [2, 3, 4]
+
+
+def test_sampler():
+    counter = iter(range(1000))
+    sampler = Sampler(interval=0.001, count=lambda: next(counter))
+    while len(sampler._buffers["count"]) < 3:
+        time.sleep(0.001)
+    sampler.stop()
+    series = sampler.series()
+    assert len(series["sample_time"]) == len(series["count"])
+    assert series["count"] == list(range(len(series["count"])))
+
+
+def test_sampler_error():
+    sampler = Sampler(interval=0.001, error=lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        sampler.stop()
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from pytest_store.stores import Stores
+from pytest_store.stores.list_dict import ListDict
+from pytest_store.stores.long_table import LongTable
+from pytest_store.stores.pandas_df import PandasDF
+from pytest_store.stores.polars_df import PolarsDF
+from pytest_store.stores.sqlite_stream import SqliteStream
+
+
+def test_polars_buffered_set():
+    store = PolarsDF()
+    for run in range(3):
+        store.set_index(run)
+        store.set("value", run * 10)
+        store.set("name", f"run{run}")
+    store.set_index(1)
+    store.set("value", 99)
+    # pending writes are visible before the frame is built
+    assert store._pending
+    assert store.get("value") == 99
+    assert store.get("missing", "default") == "default"
+    data = store.data
+    assert not store._pending
+    assert data["RUN"].to_list() == [0, 1, 2]
+    assert data["value"].to_list() == [0, 99, 20]
+    assert data["name"].to_list() == ["run0", "run1", "run2"]
+    assert store.get("name") == "run1"
+
+
+def test_polars_run_index():
+    store = PolarsDF()
+    for run in (0, 1, 2, 5, 3):
+        store.set_index(run)
+        store.set("run", run)
+    store.set_index(1)
+    assert store.get("run") == 1
+    assert store._rows == {0: 0, 1: 1, 2: 2, 5: 3, 3: 4}
+    assert store.data["RUN"].to_list() == [0, 1, 2, 5, 3]
+    store.set_index(5)
+    assert store.get("run") == 5
+    assert store.get()["run"].to_list() == [5]
+    store.set_index(6)
+    assert store.get("run", -1) == -1
+
+
+def test_pandas_typed_columns():
+    store = PandasDF()
+    for run in range(5):
+        store.set_index(run)
+        store.set("value", run)
+        store.set("flag", run % 2 == 0)
+    store.set("value", 4.5)
+    store.set("numbers", [1, 2])
+    store.set_index(2)
+    store.set("flag", None)
+    assert store.get("value") == 2
+    assert store.get("flag", "missing") == "missing"
+    assert store.get("numbers", []) == []
+    data = store.data
+    assert data["RUN"].to_list() == [0, 1, 2, 3, 4]
+    assert data["value"].dtype == "float64"
+    assert data["value"].to_list() == [0.0, 1.0, 2.0, 3.0, 4.5]
+    assert data["flag"].dtype == "boolean"
+    assert data["numbers"].to_list()[-1] == [1, 2]
+
+
+@pytest.mark.parametrize("store_cls", [ListDict, PandasDF, PolarsDF, SqliteStream, LongTable])
+def test_append(store_cls):
+    store = store_cls()
+    values = [1]
+    store.set("numbers", values)
+    for i in range(2, 5):
+        store.append("numbers", i)
+    store.append("numbers", [5, 6])
+    assert values == [1]
+    assert store.get("numbers") == [1, 2, 3, 4, 5, 6]
+    store.set_index(1)
+    assert store.append("numbers", 1) == [1]
+    store.set_index(0)
+    store.set("numbers", [0])
+    store.append("numbers", 1)
+    assert store.get("numbers") == [0, 1]
+
+
+@pytest.mark.parametrize("store_cls", [PolarsDF, SqliteStream])
+def test_append_buffers_released(store_cls):
+    store = store_cls()
+    for run in range(100):
+        store.set_index(run)
+        store.append("numbers", list(range(10)))
+        store.append("numbers", 10)
+    assert len(store._append_buffers) == 1
+    store.set_index(3)
+    store.append("numbers", 11)
+    assert store.get("numbers") == list(range(12))
+    assert [row["numbers"] for _, row in store.rows()][2:4] == [list(range(11)), list(range(12))]
+
+
+@pytest.mark.parametrize("store_cls", [ListDict, PandasDF, PolarsDF, SqliteStream, LongTable])
+def test_set_many(store_cls):
+    from pytest_store.store import Store
+
+    store = Store(store_cls())
+    store.set_index(0)
+    store.append("numbers", 1, prefix="")
+    assert store.set_many({"value": 1, "name": "a", "numbers": [2]}, prefix="test") == {
+        "test.value": 1,
+        "test.name": "a",
+        "test.numbers": [2],
+    }
+    store.record(_prefix="", numbers=[3], value=2.5)
+    store.append("numbers", 4, prefix="")
+    assert store.get("test.name", prefix="") == "a"
+    assert store.get("numbers", prefix="") == [3, 4]
+    store.set_index(1)
+    store.record(_prefix="", value=3, prefix="name")
+    assert [row.get("value") for _, row in store.store.rows()] == [2.5, 3]
+    assert store.get("prefix", prefix="") == "name"
+
+
+@pytest.mark.parametrize("store_cls", [ListDict, PandasDF, PolarsDF, SqliteStream, LongTable])
+def test_set_column(store_cls):
+    from pytest_store.store import Store
+
+    store = Store(store_cls())
+    store.run_offset = 1
+    store.set_index(0)
+    store.set("value", 1, prefix="")
+    store.set_column("PASS", {0: True, 1: False, 3: True}, prefix="")
+    assert store.get_index() == 0
+    assert store.get("PASS", prefix="") is True
+    assert [(run, row.get("PASS")) for run, row in store.store.rows() if row] == [(1, True), (2, False), (4, True)]
+
+
+@pytest.mark.parametrize("store_cls", [ListDict, PandasDF, PolarsDF, SqliteStream, LongTable])
+def test_to_string_bounded(store_cls):
+    store = store_cls()
+    for run in range(500):
+        store.set_index(run)
+        for i in range(40):
+            store.set(f"test{i}.value", run * i)
+    lines = store.to_string(max_lines=10, max_width=120).splitlines()
+    assert len(lines) <= 20
+    assert max(len(line) for line in lines) <= 120
+    assert "499" in "\n".join(lines)  # the last run is shown
+    small = store_cls()
+    small.set("value", 1)
+    assert "..." not in small.to_string(max_lines=10, max_width=120)
+
+
+@pytest.mark.parametrize("store_cls", [ListDict, SqliteStream])
+def test_to_string_whole_rows(store_cls):
+    store = store_cls()
+    for run in range(100):
+        store.set_index(run)
+        store.set("t.a", run)
+        store.set("t.b", 2 * run)
+    for max_lines in (10, 15, 20):
+        lines = [line for line in store.to_string(max_lines=max_lines).splitlines() if line.strip() not in ("", "...")]
+        assert len(lines) % 3 == 0
+        assert all(line.startswith("- RUN: ") for line in lines[::3])
+        assert lines[-3] == "- RUN: 99"
+
+
+def test_long_table(tmp_path):
+    from pytest_store.stores._store_base import SaveSettings
+
+    store = LongTable()
+    for run in range(2):
+        store.set_index(run)
+        store.set("test_a.value", run)
+        store.set("PASS", True)
+    store.set_index(0)
+    store.set("test_b.name", "x")
+    assert store.get("test_a.value") == 0
+    assert store.get() == {"test_a.value": 0, "PASS": True, "test_b.name": "x"}
+    assert len(store) == 5  # values, not runs x columns
+    columns = store.columns()
+    assert columns["test"] == ["test_a", "", "test_a", "", "test_b"]
+    assert columns["number"] == [0.0, 1.0, 1.0, 1.0, None]
+    assert store.pivot() == [
+        {"RUN": 0, "test_a.value": 0, "PASS": True, "test_b.name": "x"},
+        {"RUN": 1, "test_a.value": 1, "PASS": True},
+    ]
+    store.save(SaveSettings(tmp_path / "out.sqlite", "store", "sqlite"))
+    con = sqlite3.connect(tmp_path / "out.sqlite")
+    assert con.execute('SELECT COUNT(*), SUM(number) FROM "store"').fetchone() == (5, 3.0)
+
+
+def test_sqlite_stream(tmp_path):
+    path = tmp_path / "stream.sqlite"
+    store = SqliteStream(path, batch_size=3)
+    store.set("value", 1)
+    store.set("flag", True)
+    store.set("numbers", [1, 2])
+    # batch is written
+    with sqlite3.connect(path) as con:
+        assert con.execute('SELECT RUN, value, flag FROM store').fetchall() == [(0, 1, 1)]
+    store.append("numbers", 3)
+    store.set_index(1)
+    store.set("other", "text")
+    assert store.get("other") == "text"
+    store.set_index(0)
+    assert store.get("numbers") == [1, 2, 3]
+    assert store.get("flag") is True
+    assert store.data == [
+        {"RUN": 0, "value": 1, "flag": True, "numbers": [1, 2, 3]},
+        {"RUN": 1, "other": "text"},
+    ]
+    # the column kinds are stored in the database
+    reopened = SqliteStream(path)
+    assert reopened.data == store.data
+
+
+def test_sqlite_stream_save(tmp_path, monkeypatch):
+    from pytest_store.stores._store_base import SaveSettings
+
+    store = SqliteStream(tmp_path / "stream.sqlite")
+    store.save_to(SaveSettings(tmp_path / "stream.sqlite", "store", "sqlite"))
+    for run in range(3):
+        store.set_index(run)
+        store.set("value", run)
+    store.save_to(SaveSettings(tmp_path / "copy.sqlite", "store", "sqlite"))
+    monkeypatch.setattr(SqliteStream, "data", property(lambda self: pytest.fail("database loaded")))
+    store.save()
+    with sqlite3.connect(tmp_path / "copy.sqlite") as con:
+        assert con.execute("SELECT RUN, value FROM store").fetchall() == [(0, 0), (1, 1), (2, 2)]
+    monkeypatch.undo()
+    # the other formats are written on the thread pool with their own connection
+    store.save_to(SaveSettings(tmp_path / "out.json", "store", "json"))
+    store.save()
+    assert json.loads((tmp_path / "out.json").read_text())[-1] == {"RUN": 2, "value": 2}
+
+
+def test_registry_imports_lazily():
+    code = "import sys, pytest_store.plugin; assert not {'polars', 'pandas', 'msgspec'} & set(sys.modules)"
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert "sqlite-stream" in Stores
+    assert Stores["list-dict"] is ListDict
+    assert Stores["none"] is None
+
+
+def test_store_thread_safe():
+    import asyncio
+    import contextvars
+    import threading
+
+    from pytest_store.store import Store
+
+    store = Store(ListDict())
+    store.set_thread_safe()
+    store.set_index(0)
+
+    def work(i):
+        for _ in range(100):
+            store.append(f"thread{i}", i, prefix="")
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(work, i)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    store.set_index(1)  # the threads keep writing to run 0
+    for thread in threads:
+        thread.join()
+
+    async def task(run):
+        store.set_index(run)
+        await asyncio.sleep(0)
+        store.set("task", run, prefix="")
+
+    async def main():
+        await asyncio.gather(*(task(run) for run in (2, 3)))
+
+    asyncio.run(main())
+    assert store.get_index() == 1
+    assert store.get("thread0", prefix="") is None
+    store.set_index(0)
+    assert [len(store.get(f"thread{i}", prefix="")) for i in range(4)] == [100] * 4
+    assert [row.get("task") for _, row in store.store.rows()] == [None, 2, 3]
+
+
+def test_save_per_file_errors(tmp_path):
+    from pytest_store.stores._store_base import SaveError, SaveSettings
+
+    store = ListDict()
+    store.set_index(0)
+    store.set("value", 1)
+    for fmt in ("json", "xyz", "yaml"):
+        store.save_to(SaveSettings(tmp_path / f"out.{fmt}", "store", fmt))
+    with pytest.raises(SaveError) as excinfo:
+        store.save()
+    assert [r.settings.format for r in excinfo.value.results] == ["xyz"]
+    assert [r.error is None for r in store.save_results] == [True, False, True]
+    assert (tmp_path / "out.json").exists()
+    assert (tmp_path / "out.yaml").exists()
+
+
+@pytest.mark.parametrize("store_type", ["polars", "pandas"])
+def test_arrow_load(tmp_path, store_type):
+    from pytest_store.stores._store_base import SaveSettings
+
+    store = Stores[store_type]()
+    for run in range(3):
+        store.set_index(run)
+        store.set("value", run)
+        store.set("name", f"run{run}")
+    path = tmp_path / "out.arrow"
+    store.save(SaveSettings(path, "store", "arrow"))
+    loaded = Stores[store_type]()
+    assert loaded.load(path) == 2
+    loaded.set_index(3)
+    loaded.set("value", 3)
+    assert [(run, row.get("value")) for run, row in loaded.rows()] == [(0, 0), (1, 1), (2, 2), (3, 3)]
+    loaded.set_index(1)
+    assert loaded.get("name") == "run1"
+    # the mapped file can be replaced
+    loaded.save(SaveSettings(path, "store", "arrow"))
+    assert Stores[store_type]().load(path) == 3
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "sqlite", "jsonl", "arrows"])
+def test_save_append(tmp_path, fmt):
+    from pytest_store.stores._append import last_run
+    from pytest_store.stores._store_base import SaveSettings
+
+    path = tmp_path / f"out.{fmt}"
+    for _session in range(2):
+        store = ListDict()
+        settings = SaveSettings(path, "store", fmt, append=True)
+        first = (last_run(path, fmt, "store") or -1) + 1
+        settings.append_from = first
+        for run in range(first, first + 2):
+            store.set_index(run)
+            store.set("value", run * 10)
+        store.save(settings)
+    assert last_run(path, fmt, "store") == 3
+    if fmt == "sqlite":
+        con = sqlite3.connect(path)
+        assert con.execute('SELECT RUN, value FROM "store"').fetchall() == [(0, 0), (1, 10), (2, 20), (3, 30)]
+
+
+def test_save_append_parquet_new_columns(tmp_path):
+    import polars as pl
+    import pyarrow.parquet as pq
+
+    from pytest_store.stores._append import append_rows
+
+    path = tmp_path / "out.parquet"
+    append_rows(path, "parquet", [(0, {"a.value": 1}), (1, {"a.value": 2})])
+    append_rows(path, "parquet", [(2, {"a.value": 3.5, "b.value": "x"})])
+    append_rows(path, "parquet", [(3, {"a.value": 4})])
+    assert sorted(p.name for p in path.iterdir()) == ["part-0.parquet", "part-2.parquet", "part-3.parquet"]
+    table = pq.read_table(path).sort_by("RUN")
+    assert table.column_names == ["RUN", "a.value", "b.value"]
+    assert table.column("b.value").to_pylist() == [None, None, "x", None]
+    assert pl.read_parquet(path).sort("RUN")["a.value"].to_list() == [1.0, 2.0, 3.5, 4.0]
+
+
+def test_save_append_large_offset(tmp_path):
+    from pytest_store.stores._append import append_rows, last_run
+    from pytest_store.store import Store
+
+    path = tmp_path / "out.jsonl"
+    append_rows(path, "jsonl", [(run, {"value": run}) for run in range(3000)])
+    store = Store(ListDict())
+    store.save_to(path, append=True)
+    assert store.run_offset == 3000
+    store.set_index(0)
+    store.set("value", -1, prefix="")
+    store.save()
+    assert last_run(path, "jsonl") == 3000
+
+
+def test_dataset_writer(tmp_path):
+    import polars as pl
+
+    from pytest_store.dataset import DatasetWriter
+
+    writer = DatasetWriter(tmp_path, partition_by="test,run", runs_per_part=2, session="s1")
+    for run in range(3):
+        writer.record(run, "a.value", run)
+        writer.record(run, "b.value", run * 10)
+        writer.next_run()
+    assert len(list(tmp_path.rglob("*.parquet"))) == 2  # a and b with runs 0-1
+    writer.record(1, "PASS", True)
+    writer.close()
+    assert sorted(p.parent.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.parquet")) == [
+        "test=_session/run=0",
+        "test=a/run=0",
+        "test=a/run=2",
+        "test=b/run=0",
+        "test=b/run=2",
+    ]
+    # all parts get the same columns for '_metadata'
+    assert (tmp_path / "_common_metadata").exists()
+    assert (tmp_path / "_metadata").exists()
+    data = pl.scan_parquet(tmp_path / "test=b" / "**" / "*.parquet", hive_partitioning=True).collect()
+    assert sorted(data["value"].to_list()) == [0, 10, 20]
+
+
+def test_dataset_writer_late_values(tmp_path):
+    import pyarrow.parquet as pq
+
+    from pytest_store.dataset import DatasetWriter
+
+    writer = DatasetWriter(tmp_path, runs_per_part=2, session="s1")
+    for run in range(5):
+        writer.record(run, "a.value", run)
+        writer.next_run()
+    for run in range(5):  # e.g. 'PASS' at the end of the session
+        writer.record(run, "PASS", run != 3)
+    writer.close()
+    assert len(list(tmp_path.rglob("*.parquet"))) == 3
+    metadata = pq.read_metadata(tmp_path / "_metadata")
+    assert metadata.num_rows == 5
+    table = pq.ParquetDataset(tmp_path).read().sort_by("RUN")
+    assert table.column("RUN").to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column("PASS").to_pylist() == [True, True, True, False, True]